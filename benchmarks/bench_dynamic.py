@@ -0,0 +1,43 @@
+"""Benchmarks for rendering unique content with and without the caches.
+
+Usage:
+    $ python benchmarks/bench_dynamic.py
+"""
+
+from itertools import count
+from timeit import timeit
+
+from htmldoom import dynamic
+from htmldoom import elements as e
+
+NUMBER = 20_000
+
+_counter = count()
+
+
+def _card():
+    n = next(_counter)
+    return e.div(class_="card")(
+        e.h3()(f"User {n}"), e.p(class_="muted")(f"Last seen {n} seconds ago")
+    )
+
+
+def bench_unique_cached():
+    """Render unique content through all the caches (always a miss)."""
+    return _card()
+
+
+def bench_unique_dynamic():
+    """Render unique content bypassing the caches."""
+    with dynamic():
+        return _card()
+
+
+def main():
+    for func in (bench_unique_cached, bench_unique_dynamic):
+        secs = timeit(func, number=NUMBER)
+        print(f"{func.__name__}: {secs / NUMBER * 1e6:.2f} usec per card")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,55 @@
+"""Benchmarks for `functions.foreach` and `functions.switch` against plain Python.
+
+Usage:
+    $ python benchmarks/bench_functions.py
+"""
+
+from timeit import timeit
+
+from htmldoom import elements as e
+from htmldoom import functions as fn
+
+NUMBER = 2000
+
+STATUSES = ["good", "bad", "evil"] * 100
+
+
+def _status(x):
+    return fn.switch(
+        {
+            x == "good": lambda: e.span(style="color: green")(x),
+            x == "bad": lambda: e.span(style="color: yellow")(x),
+            x == "evil": lambda: e.span(style="color: red")(x),
+            fn.Case.DEFAULT: lambda: fn.Error.throw(ValueError(x)),
+        }
+    )
+
+
+def _status_plain(x):
+    if x == "good":
+        return e.span(style="color: green")(x)
+    if x == "bad":
+        return e.span(style="color: yellow")(x)
+    if x == "evil":
+        return e.span(style="color: red")(x)
+    raise ValueError(x)
+
+
+def bench_foreach_switch():
+    """Render the statuses with `fn.foreach` and `fn.switch`."""
+    return e.div()(*fn.foreach(STATUSES)(_status))
+
+
+def bench_map_if():
+    """Render the statuses with `map` and `if` statements."""
+    return e.div()(*map(_status_plain, STATUSES))
+
+
+def main():
+    for func in (bench_foreach_switch, bench_map_if):
+        secs = timeit(func, number=NUMBER)
+        print(f"{func.__name__}: {secs / NUMBER * 1e6:.1f} usec per list")
+
+
+if __name__ == "__main__":
+    main()
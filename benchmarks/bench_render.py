@@ -0,0 +1,92 @@
+"""Benchmarks for rendering nested element trees.
+
+Usage:
+    $ python benchmarks/bench_render.py
+"""
+
+from functools import lru_cache
+from html import escape
+from itertools import count
+from timeit import timeit
+
+from htmldoom import elements as e
+from htmldoom import render, renders, slot
+
+DEPTH = 100
+LEAF_SIZE = 10_000
+WIDTH = 1000
+NUMBER = 200
+
+ITEMS = [f"item {i} & more" for i in range(WIDTH)]
+
+_counter = count()
+
+
+def _legacy_render(*elements):
+    """The old `str` based render path: decode every child, join and return `str`."""
+    return "".join(
+        escape(el) if isinstance(el, str) else el.decode() for el in elements
+    )
+
+
+@lru_cache(maxsize=None)
+def _legacy_div(*children):
+    """The old composite tag: re-encode the decoded subtree for every level."""
+    return f"<div>{_legacy_render(*children)}</div>".encode()
+
+
+def bench_deep_tree():
+    """Build a `DEPTH` levels deep tree with a unique leaf (cache misses)."""
+    el = f"{next(_counter)}".ljust(LEAF_SIZE, ".")
+    for _ in range(DEPTH):
+        el = e.div()(el)
+    return el
+
+
+def bench_deep_tree_legacy():
+    """Same as `bench_deep_tree` with the decode/encode round trips."""
+    el = f"{next(_counter)}".ljust(LEAF_SIZE, ".")
+    for _ in range(DEPTH):
+        el = _legacy_div(el)
+    return el
+
+
+def bench_wide_tree():
+    """Render a list of `WIDTH` items (cache hits)."""
+    return render(e.ul(class_="items")(*(e.li()(item) for item in ITEMS)))
+
+
+@renders(e.div(class_="card")(e.h3()("{title}"), e.p()("{body}")))
+def _format_card(title, body):
+    return {"title": title, "body": body}
+
+
+@renders(e.div(class_="card")(e.h3()(slot("title")), e.p()(slot("body"))))
+def _slot_card(title, body):
+    return {"title": title, "body": body}
+
+
+def bench_renders_format():
+    """Fill a `renders` template with format fields."""
+    return _format_card("Tom & Jerry", "A cat and a mouse.")
+
+
+def bench_renders_slots():
+    """Fill a `renders` template with slots."""
+    return _slot_card("Tom & Jerry", "A cat and a mouse.")
+
+
+def main():
+    for func in (
+        bench_deep_tree_legacy,
+        bench_deep_tree,
+        bench_wide_tree,
+        bench_renders_format,
+        bench_renders_slots,
+    ):
+        secs = timeit(func, number=NUMBER)
+        print(f"{func.__name__}: {secs / NUMBER * 1e6:.1f} usec per call")
+
+
+if __name__ == "__main__":
+    main()
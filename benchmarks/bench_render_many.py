@@ -0,0 +1,46 @@
+"""Benchmarks for rendering a 100k rows table with `render_many`.
+
+Usage:
+    $ python benchmarks/bench_render_many.py
+"""
+
+from timeit import timeit
+
+from htmldoom import elements as e
+from htmldoom import render_many, renders, slot
+
+NUMBER = 5
+
+ROWS = [
+    (i, f"product {i} & co" if i % 5 == 0 else f"product {i}") for i in range(100_000)
+]
+
+
+@renders(e.tr()(e.td()(slot("id")), e.td()(slot("name"))))
+def render_row(row):
+    return {"id": row[0], "name": row[1]}
+
+
+def bench_map():
+    """Call the renderer once per row."""
+    return b"".join(map(render_row, ROWS))
+
+
+def bench_render_many():
+    """Render all the rows at once."""
+    return render_many(render_row, ROWS)
+
+
+def bench_render_many_chunks():
+    """Render the rows in chunks of 1000, e.g. for streaming."""
+    return b"".join(render_many(render_row, ROWS, chunk_size=1000))
+
+
+def main():
+    for func in (bench_map, bench_render_many, bench_render_many_chunks):
+        secs = timeit(func, number=NUMBER)
+        print(f"{func.__name__}: {secs / NUMBER * 1e3:.2f} msec per 100k rows")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,49 @@
+"""Benchmarks for creating elements with the tags on cache hits and misses.
+
+Usage:
+    $ python benchmarks/bench_tags.py
+"""
+
+from itertools import count
+from timeit import timeit
+
+from htmldoom import elements as e
+
+NUMBER = 20_000
+
+_counter = count()
+
+
+def bench_leaf_tag_hit():
+    """Create a leaf element with the same attributes."""
+    return e.input_(type="text", name="q")
+
+
+def bench_leaf_tag_miss():
+    """Create a leaf element with unique attributes."""
+    return e.input_(type="text", name=f"q{next(_counter)}")
+
+
+def bench_composite_tag_hit():
+    """Create a composite element with the same attributes and children."""
+    return e.p(class_="lead")("Hello, world!")
+
+
+def bench_composite_tag_miss():
+    """Create a composite element with a unique child."""
+    return e.p(class_="lead")(f"Hello, visitor {next(_counter)}!")
+
+
+def main():
+    for func in (
+        bench_leaf_tag_hit,
+        bench_leaf_tag_miss,
+        bench_composite_tag_hit,
+        bench_composite_tag_miss,
+    ):
+        secs = timeit(func, number=NUMBER)
+        print(f"{func.__name__}: {secs / NUMBER * 1e6:.2f} usec per element")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,62 @@
+"""Benchmarks for loading a large tree of values.
+
+Usage:
+    $ python benchmarks/bench_value_loader.py
+"""
+
+import atexit
+import os
+import shutil
+import tempfile
+from timeit import timeit
+
+from htmldoom.util import loadraw, loadtxt
+from htmldoom.value_loader import loadvalues
+
+DIRS = 20
+FILES = 50
+NUMBER = 5
+
+
+def _make_tree():
+    root = tempfile.mkdtemp(prefix="htmldoom-bench-")
+    atexit.register(shutil.rmtree, root, True)
+    for i in range(DIRS):
+        os.mkdir(os.path.join(root, f"section{i}"))
+        for j in range(FILES):
+            ext = "html" if j % 2 else "txt"
+            with open(os.path.join(root, f"section{i}", f"value{j}.{ext}"), "w") as f:
+                f.write(f"<b>Value {i}.{j}</b> & some more text\n" * 10)
+    return root
+
+
+ROOT = _make_tree()
+
+
+def bench_loadvalues_cold():
+    """Load all the `DIRS * FILES` values after clearing the file caches."""
+    loadtxt.cache_clear()
+    loadraw.cache_clear()
+    return loadvalues(ROOT)
+
+
+def bench_loadvalues_warm():
+    """Load all the values again, with the files already cached."""
+    return loadvalues(ROOT)
+
+
+def bench_loadvalues_lazy():
+    """Load the values lazily and access a single one."""
+    loadtxt.cache_clear()
+    loadraw.cache_clear()
+    return loadvalues(ROOT, lazy=True).section0.value0
+
+
+def main():
+    for func in (bench_loadvalues_cold, bench_loadvalues_warm, bench_loadvalues_lazy):
+        secs = timeit(func, number=NUMBER)
+        print(f"{func.__name__}: {secs / NUMBER * 1e3:.2f} msec per tree")
+
+
+if __name__ == "__main__":
+    main()
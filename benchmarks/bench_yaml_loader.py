@@ -0,0 +1,66 @@
+"""Benchmarks for loading the YAML components with and without libyaml.
+
+It also compares `loadyaml` with empty (cold) and filled (warm) caches.
+
+Usage:
+    $ python benchmarks/bench_yaml_loader.py
+"""
+
+import glob
+import os
+from timeit import timeit
+
+import yaml
+
+from htmldoom.yaml_loader import _invalidate, loadyaml
+
+NUMBER = 200
+
+FILES = sorted(glob.glob("tests/assets/yaml_components/*.yml"))
+
+COMPONENTS = os.path.abspath("tests/assets/yaml_components/valid.yml")
+
+
+def _load_all(loader):
+    for path in FILES:
+        with open(path) as f:
+            yaml.load(f, Loader=loader)
+
+
+def bench_safe_loader():
+    """Load all the test component files with the pure Python loader."""
+    _load_all(yaml.SafeLoader)
+
+
+def bench_csafe_loader():
+    """Load all the test component files with the libyaml loader."""
+    _load_all(yaml.CSafeLoader)
+
+
+def bench_loadyaml_cold():
+    """Load and render a component from a file that was never loaded."""
+    _invalidate(COMPONENTS)
+    return loadyaml(COMPONENTS, "leaf_tag.with_attrs")
+
+
+def bench_loadyaml_warm():
+    """Load an already loaded component."""
+    return loadyaml(COMPONENTS, "leaf_tag.with_attrs")
+
+
+BENCHMARKS = [bench_safe_loader, bench_loadyaml_cold, bench_loadyaml_warm]
+if yaml.__with_libyaml__:
+    BENCHMARKS.insert(1, bench_csafe_loader)
+
+
+def main():
+    if not yaml.__with_libyaml__:
+        print("PyYAML was built without libyaml, skipping bench_csafe_loader")
+
+    for func in BENCHMARKS:
+        secs = timeit(func, number=NUMBER)
+        print(f"{func.__name__}: {secs / NUMBER * 1e6:.1f} usec per load")
+
+
+if __name__ == "__main__":
+    main()
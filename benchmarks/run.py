@@ -0,0 +1,133 @@
+"""Run all the benchmarks, save the results as a baseline or compare with one.
+
+Each `benchmarks/bench_*.py` module defines `bench_*` functions (or lists them
+in `BENCHMARKS`) and the number of calls per measurement in `NUMBER`. Every
+benchmark starts with empty caches and a warm-up call, then it's measured
+`--repeat` times and the fastest time per call is kept.
+
+The timings depend on the machine, so the baseline is not tracked by git. Save
+it on the base revision before comparing the changes on the same machine.
+
+Usage:
+    $ python benchmarks/run.py                           # print the results
+    $ python benchmarks/run.py --save                    # update baseline.json
+    $ python benchmarks/run.py --compare --threshold 10  # fail on regressions
+    $ python benchmarks/run.py -k render                 # only matching names
+"""
+
+import argparse
+import glob
+import importlib
+import json
+import os
+import platform
+import sys
+from timeit import repeat
+
+from htmldoom import cache
+
+BENCHMARKS_DIR = os.path.dirname(os.path.abspath(__file__))
+BASELINE = os.path.join(BENCHMARKS_DIR, "baseline.json")
+
+
+def collect(keyword=None):
+    """Yield the (name, function, number) of all the benchmarks."""
+    sys.path.insert(0, BENCHMARKS_DIR)
+    for path in sorted(glob.glob(os.path.join(BENCHMARKS_DIR, "bench_*.py"))):
+        module = importlib.import_module(os.path.basename(path)[:-3])
+        funcs = getattr(module, "BENCHMARKS", None)
+        if funcs is None:
+            funcs = [
+                v
+                for k, v in vars(module).items()
+                if k.startswith("bench_") and callable(v)
+            ]
+        for func in funcs:
+            name = f"{module.__name__}.{func.__name__}"
+            if keyword is None or keyword in name:
+                yield name, func, module.NUMBER
+
+
+def run(keyword=None, repeats=5):
+    """Measure the benchmarks and return the seconds per call by name."""
+    results = {}
+    for name, func, number in collect(keyword):
+        # Start from the same state regardless of the benchmarks run before.
+        cache.clear_all()
+        func()
+        secs = min(repeat(func, number=number, repeat=repeats)) / number
+        results[name] = secs
+        print(f"{name}: {secs * 1e6:.2f} usec", flush=True)
+    return results
+
+
+def compare(results, baseline, threshold):
+    """Print the changes against the baseline and return the regressions."""
+    regressions = []
+    print(f"\n{'benchmark':<60} {'baseline':>12} {'current':>12} {'change':>8}")
+    for name, secs in results.items():
+        if name not in baseline:
+            print(f"{name:<60} {'-':>12} {secs * 1e6:>10.2f}us {'new':>8}")
+            continue
+        change = (secs / baseline[name] - 1) * 100
+        print(
+            f"{name:<60} {baseline[name] * 1e6:>10.2f}us"
+            f" {secs * 1e6:>10.2f}us {change:>+7.1f}%"
+        )
+        if change > threshold:
+            regressions.append(name)
+    return regressions
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("-k", dest="keyword", help="only run the matching names")
+    parser.add_argument("--repeat", type=int, default=5)
+    parser.add_argument("--baseline", default=BASELINE)
+    parser.add_argument("--save", action="store_true", help="save as the baseline")
+    parser.add_argument("--compare", action="store_true", help="compare with it")
+    parser.add_argument(
+        "--threshold",
+        type=float,
+        default=10.0,
+        help="the slowdown in percent considered a regression (default: 10)",
+    )
+    args = parser.parse_args(argv)
+    if args.compare and not os.path.exists(args.baseline):
+        print(f"{args.baseline} is missing, save it on the base revision first")
+        return 2
+
+    results = run(args.keyword, args.repeat)
+
+    if args.compare:
+        with open(args.baseline) as f:
+            baseline = json.load(f)["benchmarks"]
+        regressions = compare(results, baseline, args.threshold)
+        if regressions:
+            print(f"\n{len(regressions)} regressions above {args.threshold}%:")
+            for name in regressions:
+                print(f"  {name}")
+            return 1
+
+    if args.save:
+        data = {}
+        if args.keyword and os.path.exists(args.baseline):
+            with open(args.baseline) as f:
+                data = json.load(f)["benchmarks"]
+        data.update(results)
+        with open(args.baseline, "w") as f:
+            json.dump(
+                {
+                    "python": platform.python_version(),
+                    "machine": platform.machine(),
+                    "benchmarks": dict(sorted(data.items())),
+                },
+                f,
+                indent=2,
+            )
+            f.write("\n")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
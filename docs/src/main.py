@@ -6,6 +6,7 @@ import markdown2
 import htmldoom
 from components import document
 from htmldoom import loadtxt, render
+from htmldoom.build import build
 from htmldoom.value_loader import EXTENSION_RENDERERS, loadvalues
 
 SRC_DIR = "docs/src"
@@ -20,11 +21,12 @@ def md_to_html(path):
 
 EXTENSION_RENDERERS = dict(md=md_to_html, **EXTENSION_RENDERERS)
 
+common_values = loadvalues(f"{SRC_DIR}/values", lazy=True)
+
 
 def render_page(page):
     """Render a page."""
 
-    common_values = loadvalues(f"{SRC_DIR}/values")
     page_values = loadvalues(
         f"{SRC_DIR}/pages/{page}", extension_renderers=EXTENSION_RENDERERS
     )
@@ -34,13 +36,11 @@ def render_page(page):
 def main():
     """Generate the static docs."""
 
-    if not os.path.exists(DIST_DIR):
-        os.mkdir(DIST_DIR)
-
-    for page in os.listdir(f"{SRC_DIR}/pages"):
-        doc = render_page(page)
-        with open(f"{DIST_DIR}/{page}.html", "w") as f:
-            f.write(doc)
+    pages = {
+        page: [f"{SRC_DIR}/pages/{page}"] for page in os.listdir(f"{SRC_DIR}/pages")
+    }
+    deps = [f"{SRC_DIR}/values", f"{SRC_DIR}/layouts", f"{SRC_DIR}/components.py"]
+    build(pages, render_page, DIST_DIR, deps=deps)
 
 
 if __name__ == "__main__":
@@ -15,14 +15,36 @@ __all__ = [
     "doctype",
     "render",
     "renders",
+    "render_many",
+    "slot",
+    "stream",
+    "astream",
+    "arender",
     "raw",
     "txt",
     "comment",
+    "dynamic",
     "CacheConfig",
+    "StreamConfig",
+    "YamlConfig",
     "loadraw",
     "loadtxt",
 ]
 
 from htmldoom.base import comment, doctype, raw, txt
-from htmldoom.conf import CacheConfig
-from htmldoom.util import loadraw, loadtxt, render, renders
+from htmldoom.cache import _preload, dynamic
+from htmldoom.conf import CacheConfig, StreamConfig, YamlConfig
+from htmldoom.util import (
+    arender,
+    astream,
+    loadraw,
+    loadtxt,
+    render,
+    render_many,
+    renders,
+    slot,
+    stream,
+)
+
+# Start with the fragments cached by a previous process, see `CacheConfig.SNAPSHOT`.
+_preload()
@@ -4,17 +4,20 @@ All the important objects here are also available in __init__.py so that
 you can just do `from htmldoom import composite_tag`.
 """
 
-from functools import lru_cache
-from html import escape
-
-from htmldoom.conf import CacheConfig
-from htmldoom.util import fmt_prop
-from htmldoom.util import render as _render
+from htmldoom.cache import memoize, uncached
+from htmldoom.escape import escape
+from htmldoom.util import (
+    AsyncChildrenError,
+    AsyncElement,
+    _is_async,
+    fmt_prop,
+    render_bytes,
+)
 
 __all__ = ["doctype", "composite_tag", "leaf_tag", "txt", "raw", "comment"]
 
 
-@lru_cache(maxsize=CacheConfig.MAXSIZE)
+@memoize(shared=False, dynamic=True)
 def txt(text):
     """Convert to HTML escaped element.
 
@@ -25,7 +28,7 @@ def txt(text):
     return escape(text).encode()
 
 
-@lru_cache(maxsize=CacheConfig.MAXSIZE)
+@memoize(shared=False)
 def raw(text):
     """Convert to HTML unescaped element (use with caution).
 
@@ -36,16 +39,41 @@ def raw(text):
     return text.encode()
 
 
-@lru_cache(maxsize=CacheConfig.MAXSIZE)
+@memoize(shared=False)
 def comment(text):
     return (f"<!-- {escape(text)} -->").encode()
 
 
-@lru_cache(maxsize=CacheConfig.MAXSIZE)
+@memoize(shared=False)
 def doctype(*attrs):
     return (f"<!DOCTYPE {' '.join(fmt_prop(x, None) for x in attrs)}>").encode()
 
 
+def _fmt_props(bool_props, kv_props):
+    """Format the tag attributes, each with a leading space."""
+    if not bool_props and not kv_props:
+        return ""
+    return "".join(
+        [
+            *(f" {fmt_prop(x, None)}" for x in bool_props),
+            *(f" {fmt_prop(k, v)}" for k, v in kv_props.items()),
+        ]
+    )
+
+
+def _check_children(set_children):
+    """Render the awaitable children without the cache, see `memoize`'s `guard`."""
+    render_uncached = uncached(set_children)
+
+    def checked(*children):
+        for child in children:
+            if isinstance(child, AsyncElement) or _is_async(child):
+                return render_uncached(*children)
+        return set_children(*children)
+
+    return checked
+
+
 def leaf_tag(tagname):
     """Use it to create tags that cannot have child elements.
     
@@ -55,7 +83,7 @@ def leaf_tag(tagname):
         b'<mytag foo="bar" />'
     """
 
-    @lru_cache(maxsize=CacheConfig.MAXSIZE)
+    @memoize(tag=tagname)
     def set_props(*bool_props, **kv_props):
 
         if bool_props and (callable(bool_props[0]) or isinstance(bool_props[0], bytes)):
@@ -64,22 +92,7 @@ def leaf_tag(tagname):
                 " By the way, this is a leaf tag i.e. Doesn't support child elements."
             )
 
-        if not bool_props and not kv_props:
-            return (f"<{tagname} />").encode()
-
-        if not kv_props:
-            return (
-                f"<{tagname} {' '.join(fmt_prop(x, None) for x in bool_props)} />"
-            ).encode()
-        if not bool_props:
-            return (
-                f"<{tagname} {' '.join(fmt_prop(k, v) for k, v in kv_props.items())} />"
-            ).encode()
-
-        return (
-            f"<{tagname} {' '.join(fmt_prop(x, None) for x in bool_props)}"
-            f" {' '.join(fmt_prop(k, v) for k, v in kv_props.items())} />"
-        ).encode()
+        return f"<{tagname}{_fmt_props(bool_props, kv_props)} />".encode()
 
     return set_props
 
@@ -92,8 +105,12 @@ def composite_tag(tagname):
         >>> clipboard_copy(value="foo")("Copy Me")
         b'<clipboard-copy value="foo">Copy Me</clipboard_copy>'
     """
+    closing = f"</{tagname}>".encode()
 
-    @lru_cache(maxsize=CacheConfig.MAXSIZE)
+    # The returned closures can't be stored in the shared cache. Inside
+    # `dynamic`, the cached attributes give the uncached children. Once any
+    # awaitable child was rendered, they are checked before the cache.
+    @memoize(tag=tagname, shared=False, dynamic=uncached, guard=_check_children)
     def set_props(*bool_props, **kv_props):
 
         if bool_props and (callable(bool_props[0]) or isinstance(bool_props[0], bytes)):
@@ -102,29 +119,15 @@ def composite_tag(tagname):
                 f" Follow this syntax: {tagname}(*args, **kwargs)(element1, element2, ...)"
             )
 
-        @lru_cache(maxsize=CacheConfig.MAXSIZE)
+        # The opening and closing tags are compiled once per props signature.
+        opening = f"<{tagname}{_fmt_props(bool_props, kv_props)}>".encode()
+
         def set_children(*children):
+            try:
+                return b"".join((opening, render_bytes(*children), closing))
+            except AsyncChildrenError:
+                return AsyncElement((opening, *children, closing))
 
-            if not bool_props and not kv_props:
-                return (f"<{tagname}>{_render(*children)}</{tagname}>").encode()
-
-            if not kv_props:
-                return (
-                    f"<{tagname} {' '.join(fmt_prop(x, None) for x in bool_props)}>"
-                    f"{_render(*children)}</{tagname}>"
-                ).encode()
-            if not bool_props:
-                return (
-                    f"<{tagname} {' '.join(fmt_prop(k, v) for k, v in kv_props.items())}>"
-                    f"{_render(*children)}</{tagname}>"
-                ).encode()
-
-            return (
-                f"<{tagname} {' '.join(fmt_prop(x, None) for x in bool_props)}"
-                f" {' '.join(fmt_prop(k, v) for k, v in kv_props.items())}>"
-                f"{_render(*children)}</{tagname}>"
-            ).encode()
-
-        return set_children
+        return memoize(set_children, tag=tagname, scope=opening, nested=True)
 
     return set_props
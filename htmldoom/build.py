@@ -0,0 +1,153 @@
+"""Build static pages in parallel, skipping the pages that haven't changed.
+
+Each page is identified by a name and depends on some input files or
+directories, plus the dependencies shared by all the pages (e.g. layouts and
+common values). The content hash of the inputs of each built page is stored in
+a manifest in the output directory, so that the next build only renders the
+pages whose inputs have changed.
+
+Example:
+    >>> from htmldoom.build import build
+    >>>
+    >>> def render_page(name):
+    ...     return render(document(p=loadvalues(f"pages/{name}"), c=common_values))
+    >>>
+    >>> build(
+    ...     {name: [f"pages/{name}"] for name in os.listdir("pages")},
+    ...     render_page,
+    ...     "dist",
+    ...     deps=["layouts", "values"],
+    ...     workers=8,
+    ... )
+    ['index', 'about']
+"""
+
+import json
+import os
+from concurrent.futures import ProcessPoolExecutor
+from hashlib import sha256
+
+__all__ = ["build", "MANIFEST"]
+
+MANIFEST = ".htmldoom-manifest.json"
+
+# The build whose `initializer` was called in this process, see `_build_pages`.
+_initialized = None
+
+
+def _hash_paths(paths, digests):
+    """Hash the content of the files and directory trees, using a memo."""
+    h = sha256()
+    for path in paths:
+        path = os.path.normpath(path)
+        if path not in digests:
+            ph = sha256()
+            if os.path.isdir(path):
+                for root, dirs, files in os.walk(path):
+                    dirs.sort()
+                    for name in sorted(files):
+                        filepath = os.path.join(root, name)
+                        ph.update(os.path.relpath(filepath, path).encode())
+                        ph.update(bytes.fromhex(_hash_paths([filepath], digests)))
+            else:
+                with open(path, "rb") as f:
+                    ph.update(f.read())
+            digests[path] = ph.hexdigest()
+        h.update(path.encode())
+        h.update(bytes.fromhex(digests[path]))
+    return h.hexdigest()
+
+
+def _build_page(render_page, name, out_path):
+    """Render a page and write it with a single buffered write."""
+    data = render_page(name)
+    if isinstance(data, str):
+        data = data.encode()
+
+    tmp_path = f"{out_path}.{os.getpid()}.tmp"
+    with open(tmp_path, "wb") as f:
+        f.write(data)
+    os.replace(tmp_path, out_path)
+    return name
+
+
+def _build_pages(args):
+    """Build the pages, after calling the initializer once per build and process.
+
+    It's not passed to the process pool, which only supports it on Python 3.7+.
+    """
+    global _initialized
+    build_id, render_page, pages, initializer, initargs = args
+    if initializer is not None and _initialized != build_id:
+        initializer(*initargs)
+        _initialized = build_id
+    return [_build_page(render_page, name, out_path) for name, out_path in pages]
+
+
+def build(
+    pages,
+    render_page,
+    out_dir,
+    deps=(),
+    workers=None,
+    suffix=".html",
+    force=False,
+    initializer=None,
+    initargs=(),
+):
+    """Render the changed pages into `out_dir` and return their names.
+
+    Arguments:
+        pages: A map of page names and the input paths they depend on.
+        render_page:
+            A function that takes a page name and returns the rendered page in
+            `str` or `bytes`. It must be picklable to be used with `workers`.
+        out_dir: The directory to write the `{name}{suffix}` files into.
+        deps: The input paths shared by all the pages.
+        workers:
+            If set, render the pages in a pool of this many processes. The
+            values shared by the pages should be loaded at the module level (or
+            by `initializer`) so that each process loads them only once.
+        suffix: The output file name suffix.
+        force: If True, build all the pages even if they haven't changed.
+        initializer, initargs:
+            Called as `initializer(*initargs)` once per process before it
+            renders its first page.
+    """
+    os.makedirs(out_dir, exist_ok=True)
+    manifest_path = os.path.join(out_dir, MANIFEST)
+
+    manifest = {}
+    if not force:
+        try:
+            with open(manifest_path) as f:
+                manifest = json.load(f)
+        except (OSError, ValueError):
+            pass
+
+    digests = {}
+    deps_digest = _hash_paths(deps, digests)
+
+    todo, new_manifest = [], {}
+    for name, inputs in pages.items():
+        out_path = os.path.join(out_dir, f"{name}{suffix}")
+        digest = _hash_paths([*inputs], digests) + deps_digest
+        new_manifest[name] = digest
+        if manifest.get(name) != digest or not os.path.exists(out_path):
+            todo.append((name, out_path))
+
+    build_id = os.urandom(16)
+    if not workers or len(todo) < 2:
+        built = _build_pages((build_id, render_page, todo, initializer, initargs))
+    else:
+        chunksize = max(1, len(todo) // (workers * 4))
+        chunks = [
+            (build_id, render_page, todo[i : i + chunksize], initializer, initargs)
+            for i in range(0, len(todo), chunksize)
+        ]
+        with ProcessPoolExecutor(workers) as pool:
+            built = [name for names in pool.map(_build_pages, chunks) for name in names]
+
+    with open(manifest_path, "w") as f:
+        json.dump(new_manifest, f, indent=2, sort_keys=True)
+    return built
@@ -0,0 +1,1135 @@
+"""Caches used to memoize the rendered elements.
+
+Every cached function in htmldoom is wrapped with `memoize`. By default each
+function gets its own `functools.lru_cache` of `CacheConfig.MAXSIZE` entries,
+whose hits cost the same as with a plain `lru_cache`. Its entries can't be
+listed though, so `CacheConfig.TRACK_ENTRIES` must be set to save snapshots
+(see below). When `CacheConfig.MAXBYTES` is set, all of them share a single
+cache bounded by the total size of the cached values in bytes instead. The
+other modes below also go through a (slower) Python wrapper, so they are only
+used when configured.
+
+With `CacheConfig.ADMIT_AFTER` set to N, a value is only cached when its key
+was missed N times recently (counted by a shared `FrequencySketch`), so
+one-off dynamic texts don't evict the reusable fragments.
+
+Inside a `with dynamic():` block, the caches of the content (e.g. `txt`
+and the children of the tags) are bypassed, while the tag attributes are
+still cached. It's useful for content unique per request where caching is
+pure overhead. The memoized functions only start checking for it once it's
+first used.
+
+The `Uncached` values (e.g. the elements holding coroutines) are never
+returned from the caches. The first one returned by a memoized function turns
+on the `guard` of the memoized functions, e.g. the tags then check their
+children before looking them up.
+
+All the caches are registered by function name and tag name (for the tags),
+so that they can be inspected and cleared together.
+
+The cached fragments can be saved with `save_snapshot` after warming up with
+`CacheConfig.TRACK_ENTRIES` set, and
+loaded on import by the next processes by setting the `HTMLDOOM_CACHE_SNAPSHOT`
+environment variable (`CacheConfig.SNAPSHOT`) to the file path.
+
+Example:
+    >>> from htmldoom import CacheConfig
+    >>> from htmldoom import cache
+    >>>
+    >>> CacheConfig.MAXBYTES = 64 * 1024 * 1024  # 64 MiB for all the caches
+    >>>
+    >>> cache.cache_info()[("set_children", "p")]
+    CacheInfo(hits=1200, misses=30, currsize=30)
+    >>>
+    >>> print(cache.prometheus_metrics())
+    # HELP htmldoom_cache_hits_total Number of cache hits.
+    # TYPE htmldoom_cache_hits_total counter
+    htmldoom_cache_hits_total{function="set_children",tag="p"} 1200
+    ...
+    >>>
+    >>> cache.clear_all()
+"""
+
+import marshal
+import mmap
+import os
+import socket
+import struct
+import warnings
+from collections import OrderedDict, namedtuple
+from contextlib import contextmanager
+from functools import lru_cache, update_wrapper
+from hashlib import blake2b
+from sys import getsizeof
+from threading import Lock, local
+from time import time
+from weakref import WeakSet, WeakValueDictionary
+
+from htmldoom.conf import CacheBackend, CacheConfig
+
+__all__ = [
+    "memoize",
+    "dynamic",
+    "is_dynamic",
+    "cache_info",
+    "clear_all",
+    "reset_stats",
+    "prometheus_metrics",
+    "save_snapshot",
+    "load_snapshot",
+    "CacheInfo",
+    "FrequencySketch",
+    "LRUCache",
+    "SizedLRUCache",
+    "SharedMemoryCache",
+    "DictCache",
+    "MemcachedCache",
+    "Uncached",
+    "uncached",
+]
+
+_MISSING = object()
+_KWMARK = object()
+
+
+def _sizeof(obj):
+    """Roughly estimate the memory held by a cached key or value."""
+    if isinstance(obj, bytes) or isinstance(obj, str):
+        return len(obj)
+    if isinstance(obj, tuple):
+        return sum(map(_sizeof, obj))
+    return getsizeof(obj)
+
+
+class LRUCache:
+    """A least recently used cache bounded by the number of entries.
+
+    If `maxsize` is not specified, `CacheConfig.MAXSIZE` is used.
+    """
+
+    def __init__(self, maxsize=None):
+        self.maxsize = maxsize
+        self.data = OrderedDict()
+        self.lock = Lock()
+
+    def __len__(self):
+        return len(self.data)
+
+    def get(self, key, default=None):
+        try:
+            value = self.data[key]
+            self.data.move_to_end(key)
+        except KeyError:
+            return default
+        return value
+
+    def set(self, key, value):
+        with self.lock:
+            self.data[key] = value
+            self.data.move_to_end(key)
+            maxsize = self.maxsize if self.maxsize is not None else CacheConfig.MAXSIZE
+            while maxsize is not None and len(self.data) > maxsize:
+                self.data.popitem(last=False)
+
+    def discard(self, key):
+        with self.lock:
+            self.data.pop(key, None)
+
+    def clear(self):
+        with self.lock:
+            self.data.clear()
+
+
+class SizedLRUCache:
+    """A least recently used cache bounded by the total size in bytes.
+
+    If `maxbytes` is not specified, `CacheConfig.MAXBYTES` is used.
+    """
+
+    def __init__(self, maxbytes=None):
+        self.maxbytes = maxbytes
+        self.data = OrderedDict()
+        self.currbytes = 0
+        self.lock = Lock()
+
+    def __len__(self):
+        return len(self.data)
+
+    def get(self, key, default=None):
+        try:
+            value = self.data[key][0]
+            self.data.move_to_end(key)
+        except KeyError:
+            return default
+        return value
+
+    def set(self, key, value):
+        maxbytes = self.maxbytes if self.maxbytes is not None else CacheConfig.MAXBYTES
+        size = _sizeof(key) + _sizeof(value)
+        if maxbytes is not None and size > maxbytes:
+            return
+
+        with self.lock:
+            old = self.data.pop(key, None)
+            if old is not None:
+                self.currbytes -= old[1]
+            self.data[key] = (value, size)
+            self.currbytes += size
+            while maxbytes is not None and self.currbytes > maxbytes:
+                self.currbytes -= self.data.popitem(last=False)[1][1]
+
+    def discard(self, key):
+        with self.lock:
+            old = self.data.pop(key, None)
+            if old is not None:
+                self.currbytes -= old[1]
+
+    def clear(self):
+        with self.lock:
+            self.data.clear()
+            self.currbytes = 0
+
+
+class FrequencySketch:
+    """Approximately count how often the keys have been seen (TinyLFU style).
+
+    It's a count-min sketch of `depth` rows of `width` 8 bit counters. All the
+    counters are halved after every `10 * width` increments so that the old
+    popularity fades away.
+    """
+
+    def __init__(self, width=2**16, depth=4):
+        self.width = width
+        self.depth = depth
+        self.table = bytearray(width * depth)
+        self.additions = 0
+        self.sample_size = 10 * width
+
+    def _indexes(self, key):
+        h = (hash(key) * 0x9E3779B97F4A7C15) & 0xFFFFFFFFFFFFFFFF
+        return [
+            row * self.width + ((h >> (row * 16)) % self.width)
+            for row in range(self.depth)
+        ]
+
+    def estimate(self, key):
+        table = self.table
+        return min(table[i] for i in self._indexes(key))
+
+    def increment(self, key):
+        """Count the key once more and return the new estimated frequency."""
+        table = self.table
+        indexes = self._indexes(key)
+        count = min(table[i] for i in indexes)
+        if count < 255:
+            count += 1
+            for i in indexes:
+                if table[i] < count:
+                    table[i] = count
+
+        self.additions += 1
+        if self.additions >= self.sample_size:
+            self.table = table.translate(_HALVE)
+            self.additions //= 2
+        return count
+
+    def clear(self):
+        self.table = bytearray(self.width * self.depth)
+        self.additions = 0
+
+
+_HALVE = bytes(i >> 1 for i in range(256))
+
+
+_SHM_MAGIC = b"HTMLDOOM"
+_SHM_HEADER = struct.Struct("8sQQQ")  # magic, slots, capacity, data end
+_SHM_ENTRY = struct.Struct("16sQIIB3x")  # key, offset, length, expires, is str
+_SHM_PROBES = 16
+
+
+class SharedMemoryCache(CacheBackend):
+    """A fragment cache shared by all the processes on the host.
+
+    The fragments are stored in a memory mapped file at `path` (put it on a
+    tmpfs like /dev/shm), with an open addressing hash index of `slots` entries
+    followed by `size` bytes of data. The data is appended until it's full,
+    then the whole cache is cleared. The readers and the writers are
+    serialized with `flock`, so it can be used by any process.
+
+    The keys that are not 16 bytes hashes (see `memoize`), or have a prefix,
+    are hashed. All the processes must use the same `size` and `slots`. It's
+    only available on the POSIX systems.
+
+    Example:
+        >>> CacheConfig.SHARED = SharedMemoryCache("/dev/shm/myapp-htmldoom")
+    """
+
+    def __init__(self, path, size=64 * 1024 * 1024, slots=None, prefix=""):
+        super().__init__(prefix)
+        if slots is None:
+            slots = 1 << max(10, (size // 1024 - 1).bit_length())
+        if slots & (slots - 1):
+            raise ValueError(f"{slots}: the number of slots must be a power of 2")
+        self.path = path
+        self.slots = slots
+        self.capacity = size
+        self.data_start = _SHM_HEADER.size + slots * _SHM_ENTRY.size
+        self.lock = Lock()
+        self._pid = None
+        # Imported here so that the module can still be imported on Windows.
+        import fcntl
+
+        self._fcntl = fcntl
+        self._open()
+
+    def _open(self):
+        """Open (and initialize if needed) the file in this process.
+
+        The file is opened again after a fork, since `flock` doesn't exclude
+        the processes sharing the same file descriptor.
+        """
+        fd = os.open(self.path, os.O_RDWR | os.O_CREAT, 0o600)
+        total = self.data_start + self.capacity
+        fcntl = self._fcntl
+        fcntl.flock(fd, fcntl.LOCK_EX)
+        try:
+            header = os.pread(fd, _SHM_HEADER.size, 0)
+            if len(header) != _SHM_HEADER.size or _SHM_HEADER.unpack(header)[:3] != (
+                _SHM_MAGIC,
+                self.slots,
+                self.capacity,
+            ):
+                os.ftruncate(fd, 0)
+                os.ftruncate(fd, total)
+                os.pwrite(
+                    fd, _SHM_HEADER.pack(_SHM_MAGIC, self.slots, self.capacity, 0), 0
+                )
+        finally:
+            fcntl.flock(fd, fcntl.LOCK_UN)
+        self._fd = fd
+        self._map = mmap.mmap(fd, total)
+        self._pid = os.getpid()
+
+    @contextmanager
+    def _locked(self, exclusive):
+        fcntl = self._fcntl
+        with self.lock:
+            if self._pid != os.getpid():
+                self._open()
+            fcntl.flock(self._fd, fcntl.LOCK_EX if exclusive else fcntl.LOCK_SH)
+            try:
+                yield self._map
+            finally:
+                fcntl.flock(self._fd, fcntl.LOCK_UN)
+
+    def _hashed(self, key):
+        key = self.prefixed(key)
+        if len(key) != 16:
+            key = blake2b(key, digest_size=16).digest()
+        return key
+
+    def _find(self, mm, key):
+        """Find the index entry of the key, or the free one to insert it."""
+        mask = self.slots - 1
+        slot = int.from_bytes(key[:8], "little") & mask
+        for _ in range(_SHM_PROBES):
+            pos = _SHM_HEADER.size + slot * _SHM_ENTRY.size
+            entry = _SHM_ENTRY.unpack_from(mm, pos)
+            if entry[0] == key or entry[0] == _EMPTY_KEY:
+                return pos, entry
+            slot = (slot + 1) & mask
+        return None, None
+
+    def get(self, key):
+        key = self._hashed(key)
+        with self._locked(exclusive=False) as mm:
+            pos, entry = self._find(mm, key)
+            if pos is None or entry[0] != key:
+                return None
+            _, offset, length, expires, is_str = entry
+            if expires and expires <= time():
+                return None
+            start = self.data_start + offset
+            value = mm[start : start + length]
+        return value.decode() if is_str else value
+
+    def set(self, key, value, ttl=None):
+        key = self._hashed(key)
+        is_str = isinstance(value, str)
+        data = value.encode() if is_str else value
+        if len(data) > self.capacity:
+            return
+        expires = int(time() + ttl) + 1 if ttl else 0
+
+        with self._locked(exclusive=True) as mm:
+            end = _SHM_HEADER.unpack_from(mm, 0)[3]
+            if end + len(data) > self.capacity:
+                self._clear(mm)
+                end = 0
+            pos, entry = self._find(mm, key)
+            if pos is None:
+                return
+            mm[self.data_start + end : self.data_start + end + len(data)] = data
+            _SHM_ENTRY.pack_into(mm, pos, key, end, len(data), expires, is_str)
+            _SHM_HEADER.pack_into(
+                mm, 0, _SHM_MAGIC, self.slots, self.capacity, end + len(data)
+            )
+
+    def _clear(self, mm):
+        mm[_SHM_HEADER.size : self.data_start] = bytes(
+            self.data_start - _SHM_HEADER.size
+        )
+        _SHM_HEADER.pack_into(mm, 0, _SHM_MAGIC, self.slots, self.capacity, 0)
+
+    def clear(self):
+        with self._locked(exclusive=True) as mm:
+            self._clear(mm)
+
+    def close(self):
+        with self.lock:
+            if self._pid is not None:
+                self._map.close()
+                os.close(self._fd)
+                self._pid = None
+
+
+_EMPTY_KEY = bytes(16)
+
+
+class DictCache(CacheBackend):
+    """A `CacheBackend` in the memory of this process, e.g. for testing.
+
+    It holds up to `maxsize` entries (`CacheConfig.MAXSIZE` by default).
+    """
+
+    def __init__(self, prefix="", maxsize=None):
+        super().__init__(prefix)
+        self.data = LRUCache(maxsize)
+
+    def get(self, key):
+        value, expires = self.data.get(self.prefixed(key), (None, None))
+        if expires is not None and expires <= time():
+            return None
+        return value
+
+    def set(self, key, value, ttl=None):
+        self.data.set(self.prefixed(key), (value, time() + ttl if ttl else None))
+
+
+class MemcachedCache(CacheBackend):
+    """A `CacheBackend` using a memcached (text protocol) compatible server.
+
+    Each thread has its own connection. The errors are not raised, they just
+    make the lookups miss, so that the pages are still rendered while the
+    server is unavailable. After a failed connection, it's only tried again
+    `retry_after` seconds later, doubling after each failure up to
+    `MAX_RETRY_AFTER`.
+
+    It's meant for the expensive components shared by the hosts, see `renders`.
+
+    Example:
+        >>> menus = MemcachedCache(("10.0.0.5", 11211), prefix="myapp:")
+        >>>
+        >>> @renders(ly("layouts/menu.yml", "nav"), backend=menus, ttl=300)
+        ... def render_menu(section):
+        ...     return {"items": render_menu_items(section)}
+    """
+
+    # The TTLs longer than 30 days are timestamps for memcached.
+    MAX_RELATIVE_TTL = 30 * 24 * 60 * 60
+    MAX_RETRY_AFTER = 60
+
+    def __init__(
+        self, address=("127.0.0.1", 11211), prefix="", timeout=0.5, retry_after=1
+    ):
+        super().__init__(prefix)
+        self.address = address
+        self.timeout = timeout
+        self.retry_after = retry_after
+        self._local = local()
+        self._failures = 0
+        self._retry_at = 0
+
+    def _file(self):
+        f = getattr(self._local, "file", None)
+        if f is None:
+            if self._failures and time() < self._retry_at:
+                raise OSError(f"{self.address}: unavailable, retrying later")
+            try:
+                sock = socket.create_connection(self.address, self.timeout)
+            except OSError:
+                delay = self.retry_after * 2**self._failures
+                self._retry_at = time() + min(delay, self.MAX_RETRY_AFTER)
+                self._failures += 1
+                raise
+            self._failures = 0
+            sock.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+            f = self._local.file = sock.makefile("rwb")
+            sock.close()  # The file keeps the connection open.
+        return f
+
+    def _disconnect(self):
+        f = getattr(self._local, "file", None)
+        self._local.file = None
+        if f is not None:
+            try:
+                f.close()
+            except OSError:
+                pass
+
+    def _key(self, key):
+        return self.prefix.encode() + key.hex().encode()
+
+    def get(self, key):
+        key = self._key(key)
+        try:
+            f = self._file()
+            f.write(b"get " + key + b"\r\n")
+            f.flush()
+            line = f.readline()
+            if line == b"END\r\n":
+                return None
+            _, _, flags, length = line.split()
+            data = f.read(int(length) + 2)[:-2]
+            if f.readline() != b"END\r\n":
+                raise ValueError(f"{self.address}: unexpected memcached response")
+        except (OSError, ValueError):
+            self._disconnect()
+            return None
+        return data.decode() if flags == b"1" else data
+
+    def set(self, key, value, ttl=None):
+        key = self._key(key)
+        is_str = isinstance(value, str)
+        data = value.encode() if is_str else value
+        exptime = int(ttl or 0)
+        if exptime > self.MAX_RELATIVE_TTL:
+            exptime += int(time())
+
+        try:
+            f = self._file()
+            f.write(
+                b"set %s %d %d %d\r\n%s\r\n" % (key, is_str, exptime, len(data), data)
+            )
+            f.flush()
+            if f.readline() != b"STORED\r\n":
+                raise ValueError(f"{self.address}: the value was not stored")
+        except (OSError, ValueError):
+            self._disconnect()
+
+
+class CacheInfo(namedtuple("CacheInfo", "hits misses currsize")):
+    """Cache statistics of a function (and tag)."""
+
+    __slots__ = ()
+
+    @property
+    def hitrate(self):
+        calls = self.hits + self.misses
+        return self.hits / calls if calls else 0.0
+
+
+class Uncached:
+    """Base class of the values that `memoize` must never return from the cache.
+
+    E.g. elements holding coroutines, which can be awaited only once. They are
+    never stored in the Python caches nor the snapshots. A `functools.lru_cache`
+    stores whatever it gets though, so the first one returned turns on the
+    `guard` of the memoized functions (see `memoize`), which keep such calls
+    away from the caches from then on. That first one stays cached until it's
+    evicted.
+    """
+
+    __slots__ = ()
+
+
+_sized_cache = SizedLRUCache()
+
+_sketch = FrequencySketch()
+
+# Maps (function name, tag name) -> [hits, misses] of the dropped caches
+_stats = {}
+
+# The caches of all the memoized functions
+_memos = WeakSet()
+
+# Maps (function name, tag name) -> the memoized function saved in the snapshots
+_functions = WeakValueDictionary()
+
+# Maps (function name, tag name) -> snapshot entries to load once it's memoized
+_pending = {}
+
+# Set once `dynamic` is first used, the caches check it from then on.
+_dynamic_used = False
+# Set once an `Uncached` value is first returned, see `memoize`'s `guard`.
+_guarded = False
+_bind_lock = Lock()
+
+
+class _State(local):
+    nocache = 0
+    insert = _MISSING
+
+
+_state = _State()
+
+
+@contextmanager
+def dynamic():
+    """Bypass the content caches while rendering inside this block (per thread).
+
+    Only the functions memoized with `dynamic` are affected, the caches of
+    the tag attributes are still used. So the attributes unique per request
+    (e.g. `href=f"/users/{user.id}"`) still fill them, unless the tag is
+    called via `uncached`.
+
+    Example:
+        >>> from htmldoom import dynamic, elements as e
+        >>>
+        >>> with dynamic():
+        ...     greeting = e.p()("Hello, ", user.name)
+        ...     link = uncached(e.a)(href=f"/users/{user.id}")(user.name)
+    """
+    if not _dynamic_used:
+        _use_dynamic()
+    _state.nocache += 1
+    try:
+        yield
+    finally:
+        _state.nocache -= 1
+
+
+def is_dynamic():
+    """Check if the caches are being bypassed, see `dynamic`."""
+    return _state.nocache > 0
+
+
+def _use_dynamic():
+    """Make the memoized functions check `dynamic`, which costs a call."""
+    global _dynamic_used
+    with _bind_lock:
+        _dynamic_used = True
+        _rebind_all()
+
+
+def _use_guards():
+    """Make the memoized functions apply their `guard`, which costs a call."""
+    global _guarded
+    with _bind_lock:
+        _guarded = True
+        _rebind_all()
+
+
+def _rebind_all():
+    for memo in list(_memos):
+        memo.bind()
+
+
+class _Memo:
+    """The cache of a memoized function, see `memoize`."""
+
+    def __init__(self, func, label, shared, scope, dynamic, guard):
+        self.func = func
+        self.label = label
+        self.shared = shared
+        self.scope = scope
+        self.dynamic = dynamic
+        self.guard = guard
+        self.cls = None
+        self.lru = self.store = None
+        self.hits = self.misses = 0
+        _memos.add(self)
+
+    def __del__(self):
+        hits, misses, _ = self.info()
+        stats = _stats.setdefault(self.label, [0, 0])
+        stats[0] += hits
+        stats[1] += misses
+
+    def build(self):
+        """Create an empty cache for the current `CacheConfig`.
+
+        Without the byte budget, admission policy, shared cache or tracking of
+        the entries, it's a `functools.lru_cache` with no overhead on the hits.
+        """
+        self.clear()
+        backend = CacheConfig.SHARED if self.shared else None
+        if (
+            CacheConfig.MAXBYTES is None
+            and CacheConfig.ADMIT_AFTER <= 1
+            and backend is None
+            and not CacheConfig.TRACK_ENTRIES
+        ):
+            self.store = None
+            self.lru = lru_cache(maxsize=CacheConfig.MAXSIZE)(self._miss())
+            self.call = self.lru
+            return self.bind()
+        # Bounded by the byte budget if set, by `CacheConfig.MAXSIZE` otherwise.
+        self.store = LRUCache() if CacheConfig.MAXBYTES is None else _sized_cache
+        self.lru = None
+        self.call = self._wrapper(backend)
+        return self.bind()
+
+    def bind(self):
+        """Call the cache from the memoized function, via `guard` and `dynamic`
+        once they are used."""
+        if self.cls is None:
+            return self.call
+        call = self.call
+        if _guarded and self.guard:
+            call = _guard(self.guard, call)
+        if _dynamic_used and self.dynamic:
+            call = _bypass(self, call)
+        self.cls.__call__ = staticmethod(call)
+        return call
+
+    def _miss(self):
+        """Call the function on the misses of the `lru_cache`, see `insert`."""
+        func = self.func
+
+        def miss(*args, **kwargs):
+            value = _state.insert
+            if value is _MISSING:
+                value = func(*args, **kwargs)
+                if not _guarded and isinstance(value, Uncached):
+                    _use_guards()
+                return value
+            _state.insert = _MISSING
+            return value
+
+        return miss
+
+    def _wrapper(self, backend):
+        func, label, scope, store = self.func, self.label, self.scope, self.store
+        sized = store is _sized_cache
+        admit_after = CacheConfig.ADMIT_AFTER
+
+        def wrapper(*args, **kwargs):
+            key = args + (_KWMARK,) + tuple(kwargs.items()) if kwargs else args
+            if sized:
+                key = (self, key)
+
+            value = store.get(key, _MISSING)
+            if value is _MISSING:
+                self.misses += 1
+                if backend is None:
+                    value = func(*args, **kwargs)
+                else:
+                    value = _shared_call(backend, func, label, scope, args, kwargs)
+                if isinstance(value, Uncached):
+                    if not _guarded:
+                        _use_guards()
+                elif admit_after <= 1 or _sketch.increment((self, key)) >= admit_after:
+                    store.set(key, value)
+            else:
+                self.hits += 1
+            return value
+
+        return wrapper
+
+    def info(self):
+        """Get the hits, misses and size (except in the sized cache)."""
+        if self.lru is not None:
+            info = self.lru.cache_info()
+            return self.hits + info.hits, self.misses + info.misses, info.currsize
+        size = (
+            0 if self.store is _sized_cache or self.store is None else len(self.store)
+        )
+        return self.hits, self.misses, size
+
+    def reset(self):
+        self.hits = self.misses = 0
+        if self.lru is not None:
+            info = self.lru.cache_info()
+            self.hits, self.misses = -info.hits, -info.misses
+
+    def clear(self):
+        if self.lru is not None:
+            info = self.lru.cache_info()
+            self.hits += info.hits
+            self.misses += info.misses
+            self.lru.cache_clear()
+        elif self.store is _sized_cache:
+            with _sized_cache.lock:
+                keys = [k for k in _sized_cache.data if k[0] is self]
+            for key in keys:
+                _sized_cache.discard(key)
+        elif self.store is not None:
+            self.store.clear()
+
+    def evict(self, predicate):
+        if self.lru is not None:
+            # The entries of `lru_cache` can't be listed, nor removed one by one.
+            self.clear()
+            return
+        sized = self.store is _sized_cache
+        with self.store.lock:
+            keys = [k for k in self.store.data if not sized or k[0] is self]
+        for key in keys:
+            if predicate(*_split_key(key[1] if sized else key)):
+                self.store.discard(key)
+
+    def items(self):
+        if self.lru is not None:
+            raise ValueError(
+                f"the entries of {self.label} are not tracked, "
+                "set CacheConfig.TRACK_ENTRIES first"
+            )
+        if self.store is _sized_cache:
+            with _sized_cache.lock:
+                items = [
+                    (k[1], v[0]) for k, v in _sized_cache.data.items() if k[0] is self
+                ]
+        else:
+            with self.store.lock:
+                items = list(self.store.data.items())
+        return [(*_split_key(key), value) for key, value in items]
+
+    def insert(self, args, kwargs, value):
+        """Cache the value unless the call is cached already, return the cached one.
+
+        It's cached regardless of the admission policy.
+        """
+        if self.lru is not None:
+            # Inserted on the miss, see `_miss`.
+            _state.insert = value
+            try:
+                return self.lru(*args, **kwargs)
+            finally:
+                _state.insert = _MISSING
+        key = (
+            tuple(args) + (_KWMARK,) + tuple(kwargs.items()) if kwargs else tuple(args)
+        )
+        if self.store is _sized_cache:
+            key = (self, key)
+        cached = self.store.get(key, _MISSING)
+        if cached is not _MISSING:
+            return cached
+        self.store.set(key, value)
+        return value
+
+
+def _guard(guard, call):
+    def guarded(*args, **kwargs):
+        return guard(call(*args, **kwargs))
+
+    return guarded
+
+
+def _bypass(memo, call):
+    func, dynamic, cached = memo.func, memo.dynamic, memo.call
+    if dynamic is True:
+
+        def bypass(*args, **kwargs):
+            if _state.nocache:
+                return func(*args, **kwargs)
+            return call(*args, **kwargs)
+
+    else:
+
+        def bypass(*args, **kwargs):
+            if _state.nocache:
+                return dynamic(cached(*args, **kwargs))
+            return call(*args, **kwargs)
+
+    return bypass
+
+
+def uncached(memoized):
+    """Get the function memoized by `memoize`, e.g. for its `dynamic` option."""
+    return memoized._memo.func
+
+
+class _Memoized:
+    """The base class of the memoized functions, see `memoize`."""
+
+    def cache_clear(self):
+        self._memo.clear()
+
+    def cache_evict(self, predicate):
+        self._memo.evict(predicate)
+
+    def cache_items(self):
+        return self._memo.items()
+
+    def cache_insert(self, args, kwargs, value):
+        return self._memo.insert(args, kwargs, value)
+
+    def __reduce__(self):
+        return self.__qualname__
+
+    def __repr__(self):
+        return f"<memoized function {self.__qualname__}>"
+
+
+def memoize(
+    func=None,
+    *,
+    name=None,
+    tag=None,
+    snapshot=True,
+    shared=True,
+    scope=None,
+    nested=False,
+    dynamic=False,
+    guard=None,
+):
+    """Memoize the function using the cache configured in `CacheConfig`.
+
+    The cache is registered as `(name, tag)` where `name` defaults to the
+    function name. Like `functools.lru_cache`, the memoized function gets a
+    `cache_clear()` method, and also a `cache_evict(predicate)` method to
+    remove the entries for which `predicate(args, kwargs)` is true (all of
+    them when it's backed by `functools.lru_cache`), a `cache_items()` method
+    to list them (unless it's backed by `functools.lru_cache`, see
+    `CacheConfig.TRACK_ENTRIES`) and a `cache_insert(args, kwargs, value)`
+    method.
+
+    With `nested`, the function is created by another memoized function (e.g.
+    `set_children`). Its cache is chosen once for the current `CacheConfig`
+    and saved by `save_snapshot` with the function that returned it.
+
+    Otherwise, with `snapshot`, the cache is saved under its label. It should
+    be disabled for the functions that read files, which might have changed
+    when the snapshot is loaded.
+
+    With `shared`, the `bytes` and `str` values are also stored in (and looked
+    up from) `CacheConfig.SHARED` when it's set, under a hash of the label,
+    `scope` and arguments. `scope` tells apart the functions with the same
+    label, e.g. the opening tag of the `set_children` closures. It should be
+    disabled for the functions cheaper than a lookup there (e.g. `txt`).
+
+    With `dynamic`, the cache is bypassed inside the `dynamic` blocks. It can
+    also be a function to apply to the cached value instead, e.g. `uncached`
+    to get the uncached `set_children` of the cached tag attributes.
+
+    With `guard`, a function to apply to the cached value once any memoized
+    function returned an `Uncached` value, e.g. to check the arguments of the
+    returned function so that such values don't get cached.
+
+    Example:
+        >>> @memoize(tag="p")
+        ... def set_children(*children):
+        ...     ...
+    """
+    if func is None:
+        return lambda func: memoize(
+            func,
+            name=name,
+            tag=tag,
+            snapshot=snapshot,
+            shared=shared,
+            scope=scope,
+            nested=nested,
+            dynamic=dynamic,
+            guard=guard,
+        )
+
+    memo = _Memo(func, (name or func.__name__, tag), shared, scope, dynamic, guard)
+    if nested:
+        memoized = update_wrapper(memo.build(), func)
+        memoized._memo = memo
+        return memoized
+
+    # The cache is called directly as `__call__`, which can be swapped when
+    # it's rebuilt.
+    memo.cls = type(
+        func.__name__,
+        (_Memoized,),
+        {"__module__": func.__module__, "__qualname__": func.__qualname__},
+    )
+    memo.build()
+    memoized = update_wrapper(memo.cls(), func)
+    memoized._memo = memo
+    if snapshot:
+        _functions[memo.label] = memoized
+        entries = _pending.pop(memo.label, None)
+        if entries:
+            _load(memo, entries)
+    return memoized
+
+
+def _reconfigure(name):
+    if name in ("MAXSIZE", "MAXBYTES", "ADMIT_AFTER", "SHARED", "TRACK_ENTRIES"):
+        for memo in list(_memos):
+            if memo.cls is not None:
+                memo.build()
+
+
+CacheConfig._on_change.append(_reconfigure)
+
+
+def _shared_key(label, scope, args, kwargs):
+    """Hash the call into a key that is the same in all the processes."""
+    try:
+        # Version 2 doesn't depend on the identity of the objects, e.g. whether
+        # the strings are interned or referenced more than once.
+        data = marshal.dumps((label, scope, args, sorted(kwargs.items())), 2)
+    except ValueError:
+        return None
+    return blake2b(data, digest_size=16).digest()
+
+
+def _shared_call(backend, func, label, scope, args, kwargs):
+    """Call the function through the shared cache."""
+    key = _shared_key(label, scope, args, kwargs)
+    if key is None:
+        return func(*args, **kwargs)
+    value = backend.get(key)
+    if value is None:
+        value = func(*args, **kwargs)
+        if isinstance(value, bytes) or isinstance(value, str):
+            backend.set(key, value)
+    return value
+
+
+def _split_key(key):
+    """Split a memoized key back into the call arguments."""
+    for i, k in enumerate(key):
+        if k is _KWMARK:
+            return key[:i], dict(key[i + 1 :])
+    return key, {}
+
+
+def cache_info():
+    """Get the cache statistics aggregated per (function name, tag name).
+
+    Example:
+        >>> cache_info()[("txt", None)]
+        CacheInfo(hits=10, misses=2, currsize=2)
+    """
+    info = {label: [hits, misses, 0] for label, (hits, misses) in _stats.items()}
+    for memo in list(_memos):
+        stats = info.setdefault(memo.label, [0, 0, 0])
+        for i, n in enumerate(memo.info()):
+            stats[i] += n
+    with _sized_cache.lock:
+        memos = [k[0] for k in _sized_cache.data]
+    for memo in memos:
+        info.setdefault(memo.label, [0, 0, 0])[2] += 1
+    return {label: CacheInfo(*stats) for label, stats in info.items()}
+
+
+def clear_all():
+    """Clear all the caches. The statistics are kept, see `reset_stats`."""
+    for memo in list(_memos):
+        memo.clear()
+    _sized_cache.clear()
+    _sketch.clear()
+
+
+def reset_stats():
+    """Reset the hits and misses counters of all the caches."""
+    _stats.clear()
+    for memo in list(_memos):
+        memo.reset()
+
+
+SNAPSHOT_VERSION = 1
+
+
+def save_snapshot(path):
+    """Save the cached fragments in a file, to be loaded with `load_snapshot`.
+
+    Only the values that can be serialized with `marshal` (e.g. `bytes` and
+    `str` with such arguments) are saved, along with the caches of the
+    memoized functions returned by the memoized functions (e.g. the tags).
+    The entries must be tracked with `CacheConfig.TRACK_ENTRIES`.
+
+    Example:
+        >>> CacheConfig.TRACK_ENTRIES = True
+        >>> warm_up()  # e.g. render the most visited pages
+        >>> cache.save_snapshot("htmldoom-cache.bin")
+    """
+    functions = [
+        (label, _dump(func._memo))
+        for label, func in sorted(_functions.items(), key=str)
+    ]
+    data = marshal.dumps((SNAPSHOT_VERSION, functions))
+
+    tmp_path = f"{path}.{os.getpid()}.tmp"
+    with open(tmp_path, "wb") as f:
+        f.write(data)
+    os.replace(tmp_path, path)
+
+
+def _dump(memo):
+    entries = []
+    for args, kwargs, value in memo.items():
+        nested = hasattr(value, "_memo")
+        entry = (args, kwargs, _dump(value._memo) if nested else value, nested)
+        try:
+            marshal.dumps(entry)
+        except ValueError:
+            continue
+        entries.append(entry)
+    return entries
+
+
+def load_snapshot(path):
+    """Fill the caches with the fragments saved by `save_snapshot`.
+
+    The entries of the functions that are not defined yet (e.g. the tags
+    created later) are loaded when they get memoized. Returns the number of
+    values loaded right away.
+    """
+    with open(path, "rb") as f:
+        version, functions = marshal.load(f)
+    if version != SNAPSHOT_VERSION:
+        raise ValueError(f"{path}: unsupported cache snapshot version {version}")
+
+    count = 0
+    for label, entries in functions:
+        label = tuple(label)
+        func = _functions.get(label)
+        if func is None:
+            _pending[label] = entries
+        else:
+            count += _load(func._memo, entries)
+    return count
+
+
+def _preload():
+    """Load the snapshot at `CacheConfig.SNAPSHOT`, if any, when imported."""
+    path = CacheConfig.SNAPSHOT
+    if not path or not os.path.exists(path):
+        return 0
+    try:
+        return load_snapshot(path)
+    except (OSError, EOFError, TypeError, ValueError) as e:
+        warnings.warn(f"{path}: the cache snapshot was not loaded: {e}")
+        return 0
+
+
+def _load(memo, entries):
+    count = 0
+    for args, kwargs, value, nested in entries:
+        if nested:
+            # Inserted directly, a call might not cache it (see `ADMIT_AFTER`).
+            func = memo.insert(args, kwargs, memo.func(*args, **kwargs))
+            count += _load(func._memo, value)
+        else:
+            memo.insert(args, kwargs, value)
+            count += 1
+    return count
+
+
+def prometheus_metrics():
+    """Dump the cache statistics in the Prometheus text exposition format."""
+    info = cache_info()
+    lines = []
+    for metric, kind, desc, field in (
+        ("htmldoom_cache_hits_total", "counter", "Number of cache hits.", "hits"),
+        ("htmldoom_cache_misses_total", "counter", "Number of cache misses.", "misses"),
+        ("htmldoom_cache_entries", "gauge", "Number of cached entries.", "currsize"),
+    ):
+        lines.append(f"# HELP {metric} {desc}")
+        lines.append(f"# TYPE {metric} {kind}")
+        for (name, tag), stats in sorted(info.items(), key=lambda x: str(x[0])):
+            labels = f'function="{name}",tag="{tag or ""}"'
+            lines.append(f"{metric}{{{labels}}} {getattr(stats, field)}")
+
+    lines.append("# HELP htmldoom_cache_bytes Estimated size of the sized cache.")
+    lines.append("# TYPE htmldoom_cache_bytes gauge")
+    lines.append(f"htmldoom_cache_bytes {_sized_cache.currbytes}")
+    return "\n".join(lines) + "\n"
@@ -1,2 +1,78 @@
-class CacheConfig:
+import os
+from abc import ABC, abstractmethod
+
+
+class _Settings(type):
+    """Call the `_on_change` callbacks with the name of each changed setting."""
+
+    def __setattr__(cls, name, value):
+        super().__setattr__(name, value)
+        for callback in cls._on_change:
+            callback(name)
+
+
+class CacheConfig(metaclass=_Settings):
+    # The caches are chosen for these settings when the functions are memoized.
+    # Changing them rebuilds (empty) the caches of the module level functions,
+    # e.g. `txt` and the tags. The elements created before keep their caches.
+    _on_change = []
+    # Maximum number of entries in the cache of each function.
     MAXSIZE = 17500
+    # If set, all the caches share a single budget of this many bytes instead.
+    MAXBYTES = None
+    # Only cache a value after its key was looked up this many times recently.
+    ADMIT_AFTER = 1
+    # Load the fragments saved by `cache.save_snapshot` from this file on import.
+    SNAPSHOT = os.environ.get("HTMLDOOM_CACHE_SNAPSHOT")
+    # A `CacheBackend` shared by the processes (e.g. `cache.SharedMemoryCache`) to
+    # look up the fragments missing from the caches of this process.
+    SHARED = None
+    # Keep the entries in `cache.LRUCache`s that can be listed, e.g. to save
+    # them with `cache.save_snapshot`, instead of the faster `functools.lru_cache`.
+    TRACK_ENTRIES = False
+
+
+class StreamConfig:
+    FLUSH_SIZE = 8192
+
+
+class YamlConfig:
+    # Store the rendered YAML components in files to speed up the next start.
+    DISK_CACHE = False
+    CACHE_DIRNAME = "__htmldoom_cache__"
+
+
+class CacheBackend(ABC):
+    """The interface of the caches shared by the processes or the hosts.
+
+    The keys are `bytes` (hashes of the cached calls, see `cache.memoize`) and
+    the values are `bytes` or `str`. All the keys are prefixed with `prefix`,
+    e.g. to share a cache server between applications or to ignore the entries
+    of a previous release.
+
+    Example:
+        >>> class RedisCache(CacheBackend):
+        ...     def __init__(self, client, prefix=""):
+        ...         super().__init__(prefix)
+        ...         self.client = client
+        ...
+        ...     def get(self, key):
+        ...         return self.client.get(self.prefixed(key))
+        ...
+        ...     def set(self, key, value, ttl=None):
+        ...         self.client.set(self.prefixed(key), value, ex=ttl)
+    """
+
+    def __init__(self, prefix=""):
+        self.prefix = prefix
+
+    def prefixed(self, key):
+        return self.prefix.encode() + key
+
+    @abstractmethod
+    def get(self, key):
+        """Get the cached value, or None if it's missing or expired."""
+
+    @abstractmethod
+    def set(self, key, value, ttl=None):
+        """Cache the value for `ttl` seconds, or until it's evicted if None."""
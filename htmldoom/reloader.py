@@ -0,0 +1,249 @@
+"""Reload the YAML components and the values when their files change.
+
+By default, `loadyaml` caches the components forever. Once the reload mode is
+enabled, every loaded file is watched (with inotify on Linux, or by polling the
+file modification times otherwise), including the ones loaded before. When a
+file changes, only the cached entries that were loaded from that file are
+invalidated. The next `loadyaml` or `loadvalues` call then loads the new
+content, without restarting the process.
+
+The templates already compiled from the files (e.g. `@renders(loadyaml(...))`)
+are not reloaded, since they are compiled once when the functions are defined.
+
+Example:
+    >>> from htmldoom import reloader
+    >>>
+    >>> reloader.enable(interval=0.5)
+"""
+
+import ctypes
+import ctypes.util
+import os
+import select
+import struct
+import sys
+import time
+from threading import Lock, Thread
+
+__all__ = ["enable", "disable", "is_enabled", "watch", "PollingWatcher"]
+
+_watcher = None
+
+# The files watched while the reload mode is off, see `PollingWatcher.files`.
+# The files loaded while it's off are only stat'ed once it's enabled.
+_pending = {}
+_UNKNOWN = object()
+_lock = Lock()
+
+
+def enable(interval=1.0, inotify=True):
+    """Start watching the loaded files in a background thread.
+
+    The files loaded before are watched too. The ones that were watched before
+    `disable` are invalidated right away if they changed since.
+
+    Arguments:
+        interval (float): Seconds between the checks.
+        inotify (bool): Use inotify if it's available (on Linux).
+    """
+    global _watcher
+    disable()
+    watcher = None
+    if inotify and sys.platform.startswith("linux"):
+        try:
+            watcher = InotifyWatcher(interval)
+        except OSError:
+            pass
+    if watcher is None:
+        watcher = PollingWatcher(interval)
+    with _lock:
+        for path, (stat, callbacks) in _pending.items():
+            watcher.add(path, _stat(path) if stat is _UNKNOWN else stat, callbacks)
+        _pending.clear()
+        _watcher = watcher
+    watcher.start()
+    watcher.check()
+    return watcher
+
+
+def disable():
+    """Stop watching the files. They are still watched by the next `enable`."""
+    global _watcher
+    with _lock:
+        watcher, _watcher = _watcher, None
+    if watcher is None:
+        return
+    watcher.stop()
+    with _lock, watcher.lock:
+        for path, (stat, callbacks) in watcher.files.items():
+            _pending.setdefault(path, (stat, {}))[1].update(callbacks)
+
+
+def is_enabled():
+    return _watcher is not None
+
+
+def watch(path, callback, key=None):
+    """Call `callback()` once when the file changes, once the reload mode is on.
+
+    The callbacks registered for the file with the same `key` (the callback
+    itself by default) replace each other.
+    """
+    path = os.path.abspath(path)
+    callbacks = {callback if key is None else key: callback}
+    with _lock:
+        if _watcher is None:
+            _pending.setdefault(path, (_UNKNOWN, {}))[1].update(callbacks)
+        else:
+            _watcher.add(path, _stat(path), callbacks)
+
+
+def _stat(path):
+    try:
+        stat = os.stat(path)
+    except OSError:
+        return None
+    return stat.st_mtime_ns, stat.st_size
+
+
+class PollingWatcher:
+    """Watch files by polling their modification time and size.
+
+    The callbacks are called only once, since they are registered again when
+    the invalidated files are loaded again.
+
+    Attributes:
+        files: A map of the watched paths and their (modification time, size)
+            when they were loaded, with their callbacks by key.
+    """
+
+    def __init__(self, interval=1.0):
+        self.interval = interval
+        self.files = {}
+        self.lock = Lock()
+        self._thread = None
+        self._running = False
+
+    def watch(self, path, callback, key=None):
+        path = os.path.abspath(path)
+        self.add(path, _stat(path), {callback if key is None else key: callback})
+
+    def add(self, path, stat, callbacks):
+        """Watch the absolute path for the changes since `stat`."""
+        with self.lock:
+            self.files.setdefault(path, (stat, {}))[1].update(callbacks)
+
+    def notify(self, path):
+        """Call the callbacks registered for the file."""
+        with self.lock:
+            _, callbacks = self.files.pop(path, (None, {}))
+        for callback in callbacks.values():
+            callback()
+
+    def check(self, paths=None):
+        """Check the watched files (all of them by default) once."""
+        with self.lock:
+            if paths is None:
+                files = self.files.items()
+            else:
+                files = [(p, self.files[p]) for p in paths if p in self.files]
+            changed = [p for p, (stat, _) in files if _stat(p) != stat]
+        for path in changed:
+            self.notify(path)
+
+    def _run(self):
+        while self._running:
+            self.wait()
+
+    def wait(self):
+        """Wait for the next changes and handle them."""
+        time.sleep(self.interval)
+        self.check()
+
+    def start(self):
+        self._running = True
+        self._thread = Thread(target=self._run, name="htmldoom-reloader", daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        self._running = False
+        if self._thread is not None:
+            self._thread.join()
+            self._thread = None
+
+
+_IN_MODIFY = 0x00000002
+_IN_ATTRIB = 0x00000004
+_IN_CLOSE_WRITE = 0x00000008
+_IN_MOVED_FROM = 0x00000040
+_IN_MOVED_TO = 0x00000080
+_IN_CREATE = 0x00000100
+_IN_DELETE = 0x00000200
+_IN_MASK = (
+    _IN_MODIFY
+    | _IN_ATTRIB
+    | _IN_CLOSE_WRITE
+    | _IN_MOVED_FROM
+    | _IN_MOVED_TO
+    | _IN_CREATE
+    | _IN_DELETE
+)
+_IN_EVENT = struct.Struct("iIII")
+
+
+class InotifyWatcher(PollingWatcher):
+    """Watch files with Linux inotify, through libc.
+
+    Raises `OSError` if inotify is not available. The parent directories are
+    watched so that files replaced by editors (renamed over) are detected. The
+    files whose directory can't be watched (e.g. when the inotify watches are
+    exhausted) are polled instead.
+    """
+
+    def __init__(self, interval=1.0):
+        super().__init__(interval)
+        libc = ctypes.CDLL(ctypes.util.find_library("c"), use_errno=True)
+        try:
+            self._add_watch = libc.inotify_add_watch
+            self._fd = libc.inotify_init1(os.O_CLOEXEC)
+        except AttributeError:
+            raise OSError("inotify is not available")
+        if self._fd < 0:
+            raise OSError(ctypes.get_errno(), "inotify_init1 failed")
+        self._dirs = {}
+        self._polled = set()
+
+    def add(self, path, stat, callbacks):
+        dirname = os.path.dirname(path)
+        with self.lock:
+            if dirname not in self._dirs.values():
+                wd = self._add_watch(self._fd, os.fsencode(dirname), _IN_MASK)
+                if wd < 0:
+                    self._polled.add(path)
+                else:
+                    self._dirs[wd] = dirname
+        super().add(path, stat, callbacks)
+
+    def wait(self):
+        readable, _, _ = select.select([self._fd], [], [], self.interval)
+        if self._polled:
+            self.check(self._polled)
+        if not readable:
+            return
+
+        buf = os.read(self._fd, 64 * 1024)
+        changed, offset = set(), 0
+        while offset < len(buf):
+            wd, _, _, length = _IN_EVENT.unpack_from(buf, offset)
+            offset += _IN_EVENT.size
+            name = buf[offset : offset + length].rstrip(b"\0")
+            offset += length
+            if wd in self._dirs:
+                changed.add(os.path.join(self._dirs[wd], os.fsdecode(name)))
+
+        for path in changed:
+            self.notify(path)
+
+    def stop(self):
+        super().stop()
+        os.close(self._fd)
@@ -1,15 +1,44 @@
 """Some utility functions."""
 
-from functools import lru_cache
-from html import escape
-from re import sub
+import asyncio
+import inspect
+import mmap
+import os
+import re
+from collections import namedtuple
+from contextlib import contextmanager
+from hashlib import blake2b
+from itertools import islice
+from string import Formatter
+from threading import Lock, local
+from time import perf_counter
 
-from htmldoom.conf import CacheConfig
+from htmldoom import reloader
+from htmldoom.cache import CacheInfo, Uncached, _shared_key, cache_info, memoize
+from htmldoom.conf import StreamConfig
+from htmldoom.escape import escape, escape_bytes, escape_many
 
-__all__ = ["render", "renders", "double_quote", "fmt_prop", "loadtxt", "loadraw"]
+__all__ = [
+    "render",
+    "render_bytes",
+    "renders",
+    "render_many",
+    "slot",
+    "profile",
+    "Profile",
+    "RenderStats",
+    "stream",
+    "astream",
+    "arender",
+    "double_quote",
+    "fmt_prop",
+    "prop_name",
+    "loadtxt",
+    "loadraw",
+]
 
 
-@lru_cache(maxsize=CacheConfig.MAXSIZE)
+@memoize(shared=False, dynamic=True)
 def render(*elements):
     """Use it to render DOM elements.
     
@@ -20,26 +49,212 @@ def render(*elements):
         >>> print(render(p()("render me"), p()("me too")))
         <p>render me</p><p>me too</p>
     """
-    if not elements:
-        return ""
+    return str(render_bytes(*elements), "utf-8")
 
+
+def render_bytes(*elements):
+    """Render DOM elements into `bytes` without any intermediate `str`.
+
+    This is what the tags use internally to render their children, so that
+    nesting an element costs a single join instead of a decode/encode round trip
+    of the whole subtree. A single `memoryview` element (see `loadraw`) is
+    returned as is, so that it's only copied when joined into its parent.
+
+    Example:
+        >>> render_bytes(p()("render me"), "& me")
+        b'<p>render me</p>&amp; me'
+    """
     if len(elements) == 1:
-        el = elements[0]
+        return _render_element(elements[0])
+    return b"".join(map(_render_element, elements))
+
+
+def _render_element(el):
+    """Render a single element into `bytes`."""
+    if isinstance(el, bytes):
+        return el
+    if callable(el):
+        # Forgot to call with no arguments? no worries...
+        el = el()
+    if isinstance(el, str):
+        return escape(el).encode()
+    if isinstance(el, bytes) or isinstance(el, memoryview):
+        return el
+    if isinstance(el, AsyncElement) or _is_async(el):
+        raise AsyncChildrenError(
+            f"{el}: awaitable elements can only be rendered by arender"
+        )
+    raise ValueError(
+        f"{el}: expected either of str, bytes, or a callable but got {type(el)}"
+    )
+
+
+class AsyncChildrenError(ValueError):
+    """Raised when rendering awaitable elements synchronously."""
+
+
+class AsyncElement(Uncached, tuple):
+    """An element with awaitable children, which only `arender` can render.
+
+    The tags return it instead of `bytes` when they get any awaitable or async
+    iterable child. It's never cached.
+    """
+
+    __slots__ = ()
+
+
+def _is_async(el):
+    return inspect.isawaitable(el) or hasattr(el, "__aiter__")
+
+
+def _iterchunks(elements):
+    """Lazily yield the encoded chunks of given elements."""
+    for el in elements:
         if callable(el):
-            # Forgot to call with no arguments? no worries...
             el = el()
-        if isinstance(el, str):
-            return escape(el)
-        if isinstance(el, bytes):
-            return el.decode()
-        raise ValueError(
-            f"{el}: expected either of str, bytes, or a callable but got {type(el)}"
-        )
-    return "".join(map(render, elements))
+        if isinstance(el, bytes) or isinstance(el, memoryview):
+            yield el
+        elif isinstance(el, str):
+            yield escape(el).encode()
+        elif hasattr(el, "__iter__"):
+            yield from _iterchunks(el)
+        else:
+            raise ValueError(
+                f"{el}: expected either of str, bytes, an iterable or a callable"
+                f" but got {type(el)}"
+            )
+
+
+def stream(*elements, flush_size=None):
+    """Render DOM elements lazily as a stream of encoded chunks.
+
+    Unlike `render`, it also accepts iterables (e.g. generators) of elements,
+    which are consumed as the stream is read. Chunks are buffered until they
+    reach `flush_size` bytes (`StreamConfig.FLUSH_SIZE` by default), so the
+    returned generator can be used directly as a WSGI response body.
+
+    Example:
+        >>> from htmldoom import stream, elements as e
+        >>>
+        >>> rows = (e.li()(str(x)) for x in range(3))
+        >>> list(stream(e.h1()("Numbers"), rows, flush_size=0))
+        [b'<h1>Numbers</h1>', b'<li>0</li>', b'<li>1</li>', b'<li>2</li>']
+    """
+    if flush_size is None:
+        flush_size = StreamConfig.FLUSH_SIZE
+
+    buffer, size = [], 0
+    for chunk in _iterchunks(elements):
+        buffer.append(chunk)
+        size += len(chunk)
+        if size >= flush_size:
+            yield b"".join(buffer)
+            buffer, size = [], 0
+    if buffer:
+        yield b"".join(buffer)
+
+
+async def astream(*elements, flush_size=None):
+    """Async variant of `stream`, e.g. for ASGI streaming responses.
+
+    Example:
+        >>> from starlette.responses import StreamingResponse
+        >>>
+        >>> async def homepage(request):
+        ...     return StreamingResponse(astream(header, rows, footer))
+    """
+    for chunk in stream(*elements, flush_size=flush_size):
+        yield chunk
+
+
+async def arender(*elements, flush_size=None):
+    """Render DOM elements with awaitable children as a stream of chunks.
+
+    Like `astream`, but the elements (including the children of the tags) can
+    also be awaitables (e.g. coroutines) and async iterables that resolve to
+    elements. All the awaitables are started concurrently as soon as they're
+    reached, and the rendered prefix of the document is flushed whenever it
+    has to wait for one of them, so slow parts don't hold back the page.
+
+    Example:
+        >>> async def user_widget(user_id):
+        ...     user = await db.get_user(user_id)
+        ...     return e.p()(user.name)
+        >>>
+        >>> async def homepage(request):
+        ...     return StreamingResponse(
+        ...         arender(header, e.div()(user_widget(1), user_widget(2)), footer)
+        ...     )
+    """
+    if flush_size is None:
+        flush_size = StreamConfig.FLUSH_SIZE
+
+    tasks = []
+    buffer, size = [], 0
+    try:
+        async for chunk in _aiterchunks(_schedule(elements, tasks), tasks):
+            if chunk is None:
+                # About to wait, send what's ready.
+                if buffer:
+                    yield b"".join(buffer)
+                    buffer, size = [], 0
+                continue
+            buffer.append(chunk)
+            size += len(chunk)
+            if size >= flush_size:
+                yield b"".join(buffer)
+                buffer, size = [], 0
+        if buffer:
+            yield b"".join(buffer)
+    finally:
+        for task in tasks:
+            task.cancel()
 
 
-@lru_cache(maxsize=CacheConfig.MAXSIZE)
-def renders(*elements):
+def _schedule(elements, tasks):
+    """Start the awaitables in the elements as tasks, to run concurrently."""
+    scheduled = []
+    for el in elements:
+        if isinstance(el, AsyncElement) or type(el) in (list, tuple):
+            el = _schedule(el, tasks)
+        elif inspect.isawaitable(el):
+            el = asyncio.ensure_future(el)
+            tasks.append(el)
+        scheduled.append(el)
+    return scheduled
+
+
+async def _aiterchunks(elements, tasks):
+    """Lazily yield the encoded chunks, or None before waiting for something."""
+    for el in elements:
+        if callable(el):
+            el = el()
+        if isinstance(el, bytes) or isinstance(el, memoryview):
+            yield el
+        elif isinstance(el, str):
+            yield escape(el).encode()
+        elif inspect.isawaitable(el):
+            if not (isinstance(el, asyncio.Future) and el.done()):
+                yield None
+            async for chunk in _aiterchunks(_schedule([await el], tasks), tasks):
+                yield chunk
+        elif hasattr(el, "__aiter__"):
+            yield None
+            async for item in el:
+                async for chunk in _aiterchunks(_schedule([item], tasks), tasks):
+                    yield chunk
+        elif hasattr(el, "__iter__"):
+            async for chunk in _aiterchunks(el, tasks):
+                yield chunk
+        else:
+            raise ValueError(
+                f"{el}: expected either of str, bytes, an iterable, an awaitable"
+                f" or a callable but got {type(el)}"
+            )
+
+
+@memoize(shared=False)
+def renders(*elements, backend=None, ttl=None):
     """Decorator for rendering dynamic elements based on given template.
     
     It improves the performance a lot by pre-compiling the templates.
@@ -69,24 +284,393 @@ def renders(*elements):
         ... 
         >>> paras({"x": "awesome paragraph &"})
         b'<p>awesome paragraph &amp;</p><p>another awesome paragraph &amp;</p>'
+
+    With a `backend` (see `htmldoom.conf.CacheBackend`), the rendered bytes are
+    cached there for `ttl` seconds, by the function, template and arguments.
+    It's useful for the expensive components shared by the processes or the
+    hosts, e.g. the navigation menus.
+
+    Example (with slots):
+        >>> @renders(
+        ...     e.style()("p { color: red; }"),
+        ...     e.p()(slot("x")),
+        ...     e.div()(slot("html", raw=True)),
+        ... )
+        ... def page(x, html):
+        ...     return {"x": x, "html": html}
+        >>>
+        >>> page("awesome &", "<b>bold</b>")
+        b'<style>p { color: red; }</style><p>awesome &amp;</p><div><b>bold</b></div>'
     """
-    template = render(*elements)
+    template = bytes(render_bytes(*elements))
+    if _SLOT_RE.search(template):
+        statics, slots = _compile_slots(template)
+    else:
+        statics, slots = _compile(template.decode())
 
     def wrapped(func):
-        def renderer(*args, **kwargs):
+        def fill(*args, **kwargs):
             data = func(*args, **kwargs)
-            for k in data:
-                v = data[k]
-                if isinstance(v, str) or isinstance(v, bytes):
-                    data[k] = render(v)
-            return template.format(**data).encode()
+            parts = statics[:]
+            for i, slot in slots:
+                parts[i] = slot(data)
+            return b"".join(parts)
+
+        name = f"{func.__module__}.{func.__qualname__}"
+        if backend is not None:
+            fill = _cached_fill(fill, backend, ttl, (name, None), template)
 
+        def renderer(*args, **kwargs):
+            profiler = _profiling.profiler if _profiles else None
+            if profiler is not None:
+                return profiler.record(name, fill, *args, **kwargs)
+            return fill(*args, **kwargs)
+
+        renderer.name = name
+        renderer.func = func
+        renderer.compiled = (statics, slots)
         return renderer
 
     return wrapped
 
 
-@lru_cache(maxsize=CacheConfig.MAXSIZE)
+def _cached_fill(fill, backend, ttl, label, template):
+    """Cache the output of the renderer in the cache backend."""
+    scope = blake2b(template, digest_size=16).digest()
+
+    def cached_fill(*args, **kwargs):
+        key = _shared_key(label, scope, args, kwargs)
+        if key is None:
+            return fill(*args, **kwargs)
+        value = backend.get(key)
+        if value is None:
+            value = fill(*args, **kwargs)
+            backend.set(key, value, ttl)
+        return value
+
+    return cached_fill
+
+
+def render_many(renderer, records, chunk_size=None):
+    """Render a list of records with a `renders` decorated function at once.
+
+    It's equivalent to `b"".join(map(renderer, records))`, but the values of
+    each slot are escaped together as a column and the rows are joined in a
+    single pass.
+
+    Arguments:
+        renderer: A function decorated with `renders`.
+        records: The arguments to call the renderer with, one per row.
+        chunk_size (int): If set, return an iterator of bytes, one for every
+            `chunk_size` records, e.g. for streaming.
+
+    Example:
+        >>> @renders(e.tr()(e.td()(slot("name")), e.td()(slot("price"))))
+        ... def row(product):
+        ...     return {"name": product.name, "price": product.price}
+        >>>
+        >>> render_many(row, [Product("Tom & Jerry", 10), Product("Pooh", 5)])
+        b'<tr><td>Tom &amp; Jerry</td><td>10</td></tr><tr><td>Pooh</td><td>5</td></tr>'
+    """
+    if chunk_size is None:
+        # Smaller batches keep the intermediate lists in the CPU caches.
+        return b"".join(_render_chunks(renderer, records, 1024))
+    return _render_chunks(renderer, records, chunk_size)
+
+
+def _render_chunks(renderer, records, chunk_size):
+    records = iter(records)
+    while True:
+        batch = list(islice(records, chunk_size))
+        if not batch:
+            return
+        profiler = _profiling.profiler if _profiles else None
+        if profiler is not None:
+            yield profiler.record(renderer.name, _render_rows, renderer, batch)
+        else:
+            yield _render_rows(renderer, batch)
+
+
+def _render_rows(renderer, records):
+    func, (statics, slots) = renderer.func, renderer.compiled
+    data = [func(record) for record in records]
+    width = len(statics)
+    parts = statics * len(data)
+    for i, slot in slots:
+        parts[i::width] = _render_column(slot, data)
+    return b"".join(parts)
+
+
+_TEXT_TYPES = frozenset({str, int, float})
+
+
+def _render_column(slot, data):
+    """Render the values of a slot for all the rows, escaping them together."""
+    key = getattr(slot, "escapes", None)
+    if key is not None:
+        values = [row[key] for row in data]
+        types = set(map(type, values))
+        if types <= _TEXT_TYPES:
+            return escape_many(values if types <= {str} else list(map(str, values)))
+    return [slot(row) for row in data]
+
+
+class _Profiling(local):
+    profiler = None
+
+
+# The `Profile` of the current `profile` block in each thread.
+_profiling = _Profiling()
+
+# The number of `profile` blocks in all the threads, so that the renderers don't
+# look up the profiler of the thread when there are none.
+_profiles = 0
+_profiles_lock = Lock()
+
+
+class RenderStats(namedtuple("RenderStats", "calls seconds bytes")):
+    """Profiling statistics of a `renders` decorated function."""
+
+    __slots__ = ()
+
+
+class Profile:
+    """Rendering statistics recorded inside a `profile` block.
+
+    Attributes:
+        renders: A map of `renders` decorated function names and their
+            `RenderStats`. The time includes the nested `renders` calls.
+        cache: A map of cache labels (function name, tag name) and their
+            `CacheInfo` with the hits and misses inside the block.
+        stacks: A map of the `renders` call stacks (names joined with `;`) and
+            the time spent in them in seconds, excluding the nested calls.
+    """
+
+    def __init__(self):
+        self.renders = {}
+        self.cache = {}
+        self.stacks = {}
+        self._lock = Lock()
+        self._local = local()
+
+    def record(self, name, func, *args, **kwargs):
+        """Call the render function and record its statistics under `name`."""
+        stack = self._local.__dict__.setdefault("stack", [])
+        frame = [name, 0.0]
+        stack.append(frame)
+        start = perf_counter()
+        try:
+            result = func(*args, **kwargs)
+        finally:
+            elapsed = perf_counter() - start
+            path = ";".join(n for n, _ in stack)
+            stack.pop()
+            if stack:
+                stack[-1][1] += elapsed
+
+        with self._lock:
+            calls, seconds, size = self.renders.get(name, (0, 0.0, 0))
+            self.renders[name] = RenderStats(
+                calls + 1, seconds + elapsed, size + len(result)
+            )
+            self.stacks[path] = self.stacks.get(path, 0.0) + elapsed - frame[1]
+        return result
+
+    def collapsed(self):
+        """Dump the call stacks in the collapsed format of flamegraph.pl.
+
+        The values are in microseconds.
+        """
+        return "".join(
+            f"{path} {round(secs * 1e6)}\n"
+            for path, secs in sorted(self.stacks.items())
+        )
+
+
+@contextmanager
+def profile():
+    """Record the rendering statistics while inside this block.
+
+    It's meant for debugging slow pages, since it costs some overhead for every
+    `renders` call. Only the `renders` calls of the current thread are
+    recorded, but the tag cache hits and misses are taken from the cache
+    statistics (see `htmldoom.cache.cache_info`), so they include all the
+    threads.
+
+    Example:
+        >>> from htmldoom.util import profile
+        >>>
+        >>> with profile() as prof:
+        ...     render_page(request)
+        >>>
+        >>> prof.renders["app.render_page"]
+        RenderStats(calls=1, seconds=0.0021, bytes=16384)
+        >>> prof.cache[("set_children", "p")]
+        CacheInfo(hits=120, misses=3, currsize=40)
+        >>>
+        >>> with open("page.folded", "w") as f:
+        ...     f.write(prof.collapsed())  # flamegraph.pl page.folded > page.svg
+    """
+    global _profiles
+    prof, previous = Profile(), _profiling.profiler
+    before = cache_info()
+    with _profiles_lock:
+        _profiles += 1
+    _profiling.profiler = prof
+    try:
+        yield prof
+    finally:
+        _profiling.profiler = previous
+        with _profiles_lock:
+            _profiles -= 1
+        for label, info in cache_info().items():
+            hits, misses, _ = before.get(label, (0, 0, 0))
+            if info.hits != hits or info.misses != misses:
+                prof.cache[label] = CacheInfo(
+                    info.hits - hits, info.misses - misses, info.currsize
+                )
+
+
+_SLOT_RE = re.compile(b"\\x00htmldoom-slot:(txt|raw):([^\\x00]*)\\x00")
+
+
+def slot(name, raw=False):
+    """A placeholder for a dynamic value in the templates of `renders`.
+
+    When a template has any slot, it's compiled using the slots only, so the
+    `{` and `}` in it don't need to be escaped.
+
+    Arguments:
+        name (str): The key of the value in the data returned by the renderer.
+        raw (bool): If True, `str` values are inserted without HTML escaping.
+
+    Example:
+        >>> e.p()(slot("x"))
+        b'<p>\\x00htmldoom-slot:txt:x\\x00</p>'
+    """
+    return f"\0htmldoom-slot:{'raw' if raw else 'txt'}:{name}\0".encode()
+
+
+def _compile_slots(template):
+    """Compile a template with `slot` placeholders into static chunks and slots.
+
+    The escaping of each slot is decided here, once.
+    """
+    statics, slots, start = [], [], 0
+    for match in _SLOT_RE.finditer(template):
+        statics.append(template[start : match.start()])
+        kind, name = match.group(1), match.group(2).decode()
+        slots.append(
+            (len(statics), _raw_slot(name) if kind == b"raw" else _txt_slot(name))
+        )
+        statics.append(b"")
+        start = match.end()
+    statics.append(template[start:])
+    return statics, tuple(slots)
+
+
+def _txt_slot(name):
+    def txt_slot(data):
+        val = data[name]
+        if isinstance(val, str):
+            return escape(val).encode()
+        if isinstance(val, bytes) or isinstance(val, memoryview):
+            return val
+        return escape(str(val)).encode()
+
+    txt_slot.escapes = name
+    return txt_slot
+
+
+def _raw_slot(name):
+    def slot(data):
+        val = data[name]
+        if isinstance(val, bytes) or isinstance(val, memoryview):
+            return val
+        return str(val).encode()
+
+    return slot
+
+
+def _compile(template):
+    """Compile a format string template into static byte chunks and slots.
+
+    Returns a list of pre-encoded chunks where placeholders are left as empty
+    bytes, and a tuple of `(index, slot)` pairs where each slot is a function
+    that renders its placeholder from the data dict.
+    """
+    statics, slots, literal = [], [], ""
+    for text, field, spec, conversion in Formatter().parse(template):
+        literal += text
+        if field is None:
+            continue
+        if literal:
+            statics.append(literal.encode())
+            literal = ""
+        slots.append((len(statics), _compile_slot(field, spec, conversion)))
+        statics.append(b"")
+    if literal:
+        statics.append(literal.encode())
+    return statics, tuple(slots)
+
+
+_FIELD_KEY_RE = re.compile(r"\.([^.[]+)|\[([^\]]+)\]")
+
+
+def _split_field(field):
+    """Split a template field name into the first name and the attributes or keys.
+
+    Like `str.format`, e.g. `a.b[0]` gives `("a", ((True, "b"), (False, 0)))`.
+    """
+    first, rest = re.match(r"([^.[]*)(.*)", field).groups()
+    keys = []
+    while rest:
+        match = _FIELD_KEY_RE.match(rest)
+        if match is None:
+            raise ValueError(f"{field}: invalid field name in the template")
+        attr, key = match.groups()
+        if attr is not None:
+            keys.append((True, attr))
+        else:
+            keys.append((False, int(key) if key.isdigit() else key))
+        rest = rest[match.end() :]
+    return int(first) if first.isdigit() else first, tuple(keys)
+
+
+def _compile_slot(field, spec, conversion):
+    """Compile a single `{field!conversion:spec}` placeholder."""
+    first, rest = _split_field(field)
+
+    if not rest and not spec and not conversion:
+
+        def slot(data):
+            val = data[first]
+            if isinstance(val, bytes) or isinstance(val, memoryview):
+                return val
+            if isinstance(val, str):
+                return escape(val).encode()
+            return format(val).encode()
+
+        return slot
+
+    def slot(data):
+        val = data[first]
+        if isinstance(val, str) or isinstance(val, bytes):
+            val = render(val)
+        for is_attr, key in rest:
+            val = getattr(val, key) if is_attr else val[key]
+        if conversion == "s":
+            val = str(val)
+        elif conversion == "r":
+            val = repr(val)
+        elif conversion == "a":
+            val = ascii(val)
+        return format(val, spec.format(**data) if "{" in spec else spec).encode()
+
+    return slot
+
+
+@memoize(shared=False)
 def double_quote(txt):
     """Double quote strings safely for attributes.
     
@@ -97,20 +681,36 @@ def double_quote(txt):
     return '"{}"'.format(txt.replace('"', '\\"'))
 
 
-@lru_cache(maxsize=CacheConfig.MAXSIZE)
+@memoize(shared=False)
 def fmt_prop(key, val):
     """Format a key-value pair for an HTML tag."""
-    key = key.rstrip("_").replace("_", "-")
+    key = prop_name(key)
     if val is None:
-        if sub("[a-zA-Z_]", "", key):
+        if re.sub("[a-zA-Z_]", "", key):
             return double_quote(key)
         return key
+    if isinstance(val, bytes):
+        val = val.decode()
     return f"{key}={double_quote(val)}"
 
 
+@memoize(shared=False)
+def prop_name(key):
+    """Normalize a Python friendly attribute name (e.g. class_, http_equiv).
+
+    Example:
+        >>> prop_name("http_equiv")
+        'http-equiv'
+    """
+    return key.rstrip("_").replace("_", "-")
+
+
+@memoize(snapshot=False, shared=False)
 def loadtxt(path, static=False):
     """Loads raw file data from given path with escaped HTML.
 
+    The loaded files are cached, so that each file is held once per process.
+
     Arguments:
         path (str): Path to the file to read.
         static (bool):
@@ -127,34 +727,76 @@ def loadtxt(path, static=False):
         >>> loadtxt("path/to/file.html", static=True)
         >>> b'&lt;p&gt;{{foo}}&lt;/p&gt;'
     """
-    with open(path) as f:
-        data = f.read().strip()
-    if static:
-        data = data.replace("{", "{{").replace("}", "}}")
-    return escape(data).encode()
+    reloader.watch(path, lambda: _evict_path(loadtxt, path), key=loadtxt)
+    return escape_bytes(_readbytes(path, static))
 
 
-def loadraw(path, static=False):
+@memoize(snapshot=False, shared=False)
+def loadraw(path, static=False, mmap=False):
     """Loads raw file data from given path with unescaped HTML.
 
+    The file is read as bytes without decoding and the loaded files are cached,
+    so that each file is held once per process.
+
     Arguments:
         path (str): Path to the file to read.
         static (bool):
             If True, all the `{` and `}` will be replaced
             with `{{` and `}}` respectively.
+        mmap (bool):
+            If True, memory-map the file and return a read-only `memoryview`
+            of it instead of copying it into memory. It's useful for large
+            static assets. Can't be used with `static`.
 
     Example:
         >>> # $ cat path/to/file.html
         >>> # <p>{foo}</p>
         >>> 
-        >>> loadtxt("path/to/file.html")
+        >>> loadraw("path/to/file.html")
         >>> b'<p>{foo}</p>'
         >>> 
-        >>> loadtxt("path/to/file.html", static=True)
+        >>> loadraw("path/to/file.html", static=True)
         >>> b'<p>{{foo}}</p>'
     """
-    with open(path) as f:
+    if mmap and static:
+        raise ValueError(f"{path}: `static` files can't be memory-mapped.")
+
+    reloader.watch(path, lambda: _evict_path(loadraw, path), key=loadraw)
+    if mmap:
+        return _mapbytes(path)
+    return _readbytes(path, static)
+
+
+def _readbytes(path, static):
+    with open(path, "rb") as f:
         data = f.read().strip()
     if static:
-        data = data.replace("{", "{{").replace("}", "}}")
-    return data.encode()
+        data = data.replace(b"{", b"{{").replace(b"}", b"}}")
+    return data
+
+
+_WHITESPACE = b" \t\n\r\x0b\x0c"
+
+
+def _mapbytes(path):
+    """Memory-map a file and return a stripped `memoryview` of it."""
+    with open(path, "rb") as f:
+        if os.fstat(f.fileno()).st_size == 0:
+            return b""
+        view = memoryview(mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ))
+
+    start, end = 0, len(view)
+    while start < end and view[start] in _WHITESPACE:
+        start += 1
+    while end > start and view[end - 1] in _WHITESPACE:
+        end -= 1
+    return view[start:end]
+
+
+def _evict_path(func, path):
+    """Evict the cached results of a file loader for given path."""
+    path = os.path.abspath(path)
+    func.cache_evict(
+        lambda args, kwargs: os.path.abspath(args[0] if args else kwargs["path"])
+        == path
+    )
@@ -1,28 +1,63 @@
 import os
+import pickle
 from collections import namedtuple
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+from functools import partial
+from threading import Lock
 from types import MappingProxyType
 
+from htmldoom import reloader
 from htmldoom.util import loadraw, loadtxt, render
 from htmldoom.yaml_loader import loadyaml
 
+
+def _render_txt(path):
+    return render(loadtxt(path))
+
+
+def _render_raw(path):
+    return render(loadraw(path))
+
+
+def _render_yaml(path):
+    return render(loadyaml(path))
+
+
 EXTENSION_RENDERERS = MappingProxyType(
     {
-        "txt": lambda path: render(loadtxt(path)),
-        "html": lambda path: render(loadraw(path)),
-        "css": lambda path: render(loadraw(path)),
-        "js": lambda path: render(loadraw(path)),
-        "yml": lambda path: render(loadyaml(path)),
-        "yaml": lambda path: render(loadyaml(path)),
+        "txt": _render_txt,
+        "html": _render_raw,
+        "css": _render_raw,
+        "js": _render_raw,
+        "yml": _render_yaml,
+        "yaml": _render_yaml,
     }
 )
 
+# File types that are loaded in a process pool when using `workers`.
+CPU_BOUND_EXTENSIONS = frozenset({"yml", "yaml", "md"})
+
 
-def loadvalues(path, extension_renderers=None):
+def loadvalues(
+    path,
+    extension_renderers=None,
+    lazy=False,
+    workers=None,
+    process_extensions=CPU_BOUND_EXTENSIONS,
+):
     """Scan a directory and load the values in a nested namedtuple.
 
     Arguments:
         path: Path to the directory of files containing values.
         extension_renderers: A map of file extensions and their renderers.
+        lazy:
+            If True, return a `LazyValues` namespace instead, which reads and
+            renders each file on the first access of its attribute.
+        workers:
+            If set, load the files concurrently with this many workers. Files
+            with `process_extensions` are loaded in a process pool (when their
+            renderers can be pickled), the rest in a thread pool.
+        process_extensions: File extensions that are expensive to render.
 
     Example:
         >>> from htmldoom.value_loader import loadvalues
@@ -36,11 +71,24 @@ def loadvalues(path, extension_renderers=None):
     if extension_renderers is None:
         extension_renderers = EXTENSION_RENDERERS
 
+    if lazy and workers:
+        raise ValueError("The values can either be loaded lazily or concurrently.")
+
+    nodes = _scan(path, extension_renderers)
+    if lazy:
+        return _lazy(nodes)
+    if workers:
+        return _load_concurrently(nodes, workers, process_extensions)
+    return _namedtuples(nodes, lambda loader: loader())
+
+
+def _scan(path, extension_renderers):
+    """Find the values in a directory, mapping their names to their loaders."""
     nodes = {}
     for node in os.listdir(path):
         _path = os.path.join(path, node)
         if os.path.isdir(_path):
-            filename, value = node, loadvalues(_path)
+            filename, value = node, _scan(_path, extension_renderers)
         else:
             if node.count(".") != 1:
                 raise NameError(f"{_path}: Invalid filename.")
@@ -54,7 +102,129 @@ def loadvalues(path, extension_renderers=None):
             if filename in nodes:
                 raise NameError(f"{_path}: Duplicate file name: {filename}.")
 
-            value = extension_renderers[extension](_path)
+            value = partial(_loadvalue, _path, extension_renderers[extension])
 
         nodes[filename] = value
-    return namedtuple("Values", nodes.keys())(**nodes)
+    return nodes
+
+
+def _lazy(nodes):
+    """Wrap the scanned values in nested `LazyValues`."""
+    return LazyValues(
+        {
+            name: partial(_lazy, node) if isinstance(node, dict) else node
+            for name, node in nodes.items()
+        }
+    )
+
+
+def _namedtuples(nodes, load):
+    """Load the scanned values into nested namedtuples using `load(loader)`."""
+    values = {
+        name: _namedtuples(node, load) if isinstance(node, dict) else load(node)
+        for name, node in nodes.items()
+    }
+    return namedtuple("Values", values.keys())(**values)
+
+
+def _loaders(nodes):
+    for node in nodes.values():
+        if isinstance(node, dict):
+            yield from _loaders(node)
+        else:
+            yield node
+
+
+def _picklable(obj):
+    try:
+        pickle.dumps(obj)
+    except Exception:
+        return False
+    return True
+
+
+def _load_concurrently(nodes, workers, process_extensions):
+    """Load the scanned values using thread and process pools."""
+    in_processes, in_threads = [], []
+    for loader in _loaders(nodes):
+        path, renderer = loader.args
+        if path.rsplit(".", 1)[-1] in process_extensions and _picklable(renderer):
+            in_processes.append(loader)
+        else:
+            in_threads.append(loader)
+
+    # The worker processes are forked when the work is submitted, so it's all
+    # submitted before any thread starts (and might hold a lock while forking).
+    futures, processes = {}, None
+    try:
+        if in_processes:
+            processes = ProcessPoolExecutor(workers)
+            for loader in in_processes:
+                futures[loader] = processes.submit(loader)
+        with ThreadPoolExecutor(workers) as threads:
+            for loader in in_threads:
+                futures[loader] = threads.submit(loader)
+            return _namedtuples(nodes, lambda loader: futures[loader].result())
+    finally:
+        if processes is not None:
+            processes.shutdown()
+
+
+class LazyValues:
+    """A namespace of values that are loaded on the first access.
+
+    Example:
+        >>> values = loadvalues("path/to/values", lazy=True)
+        >>> 
+        >>> values.foo  # Reads and renders path/to/values/foo.txt
+        'bar'
+        >>> values.foo  # Memoized
+        'bar'
+    """
+
+    def __init__(self, loaders):
+        self._loaders = loaders
+
+    @property
+    def _fields(self):
+        return tuple(self._loaders)
+
+    def __getattr__(self, name):
+        try:
+            loader = self.__dict__["_loaders"][name]
+        except KeyError:
+            raise AttributeError(name) from None
+        value = loader()
+        self.__dict__[name] = value
+        return value
+
+    def __dir__(self):
+        return [*super().__dir__(), *self._loaders]
+
+    def __repr__(self):
+        loaded = ", ".join(
+            f"{k}={self.__dict__[k]!r}" for k in self._loaders if k in self.__dict__
+        )
+        return f"LazyValues({loaded})"
+
+
+# Maps (path, renderer) -> value, only used in the reload mode.
+_values = {}
+_values_lock = Lock()
+
+
+def _loadvalue(path, renderer):
+    """Render a value file. In the reload mode, it's cached until it changes."""
+    if not reloader.is_enabled():
+        return renderer(path)
+
+    key = (os.path.abspath(path), renderer)
+    with _values_lock:
+        if key in _values:
+            return _values[key]
+
+    reloader.watch(path, lambda: _values.pop(key, None), key=key)
+    value = renderer(path)
+    with _values_lock:
+        _values[key] = value
+    return value
@@ -2,15 +2,40 @@
 
 Find the examples YAML formats in: tests/assets/yaml_components/valid.yml
 Or the `VALID_FORMAT` variable in this module.
+
+With `YamlConfig.DISK_CACHE` enabled, the rendered components are also stored
+in a `__htmldoom_cache__` directory next to the YAML files (much like
+`__pycache__`), so that the next process can load them without parsing YAML.
+They are written at exit, or by calling `save_disk_caches`.
+
+The YAML files are parsed with the libyaml based `CSafeLoader` when PyYAML was
+built with it, falling back to the pure Python `SafeLoader`. `LIBYAML` tells
+which one is being used.
 """
 
-from functools import lru_cache
+import atexit
+import marshal
+import os
+from hashlib import sha256
+from threading import Lock
+
+from yaml import dump, load
 
-from yaml import SafeLoader, dump, load
+try:
+    from yaml import CSafeLoader as Loader
+except ImportError:  # PyYAML was built without libyaml
+    from yaml import SafeLoader as Loader
 
-from htmldoom import render
+import htmldoom
+from htmldoom import reloader
 from htmldoom.base import composite_tag, leaf_tag, txt
-from htmldoom.conf import CacheConfig
+from htmldoom.cache import memoize
+from htmldoom.conf import YamlConfig
+from htmldoom.util import render_bytes
+
+LIBYAML = Loader.__name__ == "CSafeLoader"
+
+DISK_CACHE_VERSION = 1
 
 VALID_FORMAT = """
 * Leaf tag: <tagname />
@@ -154,12 +179,12 @@ def parse(data):
         return _to_element(tagname, attributes, inner)
 
     if isinstance(data, list):
-        return render(*[parse(x) for x in data if x is not None]).encode()
+        return render_bytes(*[parse(x) for x in data if x is not None])
 
-    return render(data).encode()
+    return render_bytes(data)
 
 
-@lru_cache(maxsize=CacheConfig.MAXSIZE)
+@memoize(snapshot=False, shared=False)
 def loadyaml(path, directive=None, static=False):
     """Loads given YAML file/directive into HTML
 
@@ -188,22 +213,197 @@ def loadyaml(path, directive=None, static=False):
         >>> loadyaml("/path/to/components.yml", ("paragraph", "case", True))
         b'<p>{foo}</p>'
     """
-    with open(path) as f:
-        elements = load(f, Loader=SafeLoader)
+    return _library(path).load(directive, static)
+
+
+class YamlLibrary:
+    """A YAML components file that is parsed once for all its directives.
+
+    The file is loaded on first access, and each directive is rendered with
+    `parse` on its first access and memoized.
+
+    Example:
+        >>> from htmldoom.yaml_loader import YamlLibrary
+        >>>
+        >>> components = YamlLibrary("/path/to/components.yml")
+        >>>
+        >>> components["paragraph.myfav"]
+        b'<p>{foo}</p>'
+        >>>
+        >>> components.load(("paragraph", "case", True), static=True)
+        b'<p>{{foo}}</p>'
+    """
+
+    def __init__(self, path):
+        self.path = path
+        self.disk_cache = YamlConfig.DISK_CACHE
+        self._entries = _disk_cache(path) if self.disk_cache else {}
+        self._document = None
+        self._loaded = False
+        self._lock = Lock()
+
+    def __getitem__(self, directive):
+        return self.load(directive)
+
+    @property
+    def document(self):
+        """The parsed YAML document."""
+        with self._lock:
+            if not self._loaded:
+                with open(self.path) as f:
+                    self._document = load(f, Loader=Loader)
+                self._loaded = True
+        return self._document
+
+    def load(self, directive=None, static=False):
+        """Loads the component into HTML. See `loadyaml` for the arguments."""
+        if isinstance(directive, str):
+            directive = directive.split(".")
+        key = (tuple(directive or ()), static)
+
+        data = self._entries.get(key)
+        if data is not None:
+            return data
+
+        if static:
+            data = self.load(directive).replace(b"{", b"{{").replace(b"}", b"}}")
+        else:
+            elements = self.document
+            for node in key[0]:
+                elements = elements[node]
+
+            if elements is None:
+                raise ValueError(
+                    f"Invalid format here: {self.path} Valid format is:\n{VALID_FORMAT}"
+                )
+
+            data = parse(elements)
+
+        self._entries[key] = data
+        if self.disk_cache:
+            _unsaved.add(os.path.abspath(self.path))
+        return data
+
+
+_libraries = {}
+_libraries_lock = Lock()
+
+
+def _library(path):
+    """Get the shared `YamlLibrary` of a YAML file."""
+    path = os.path.abspath(path)
+    with _libraries_lock:
+        if path not in _libraries:
+            _libraries[path] = YamlLibrary(path)
+            reloader.watch(path, lambda: _invalidate(path), key=_invalidate)
+        return _libraries[path]
+
+
+def _invalidate(path):
+    """Forget everything loaded from the YAML file."""
+    with _libraries_lock:
+        _libraries.pop(path, None)
+    with _disk_caches_lock:
+        _disk_caches.pop(path, None)
+        _unsaved.discard(path)
+    loadyaml.cache_evict(
+        lambda args, kwargs: os.path.abspath(args[0] if args else kwargs["path"])
+        == path
+    )
+
+
+_disk_caches = {}
+_disk_caches_lock = Lock()
+
+# The paths of the YAML files whose disk cache has changed since it was saved
+_unsaved = set()
+
+
+def _disk_cache_path(path):
+    dirname, filename = os.path.split(os.path.abspath(path))
+    return os.path.join(dirname, YamlConfig.CACHE_DIRNAME, f"{filename}.cache")
+
+
+def _file_hash(path):
+    with open(path, "rb") as f:
+        return sha256(f.read()).hexdigest()
+
+
+def _disk_cache(path):
+    """Get the cached components of a YAML file, keyed by (directive, static).
+
+    The cache file is valid if it was written by the same htmldoom version, for
+    the current mtime and size of the YAML file, or if the YAML file content
+    still has the same hash.
+    """
+    path = os.path.abspath(path)
+    with _disk_caches_lock:
+        if path in _disk_caches:
+            return _disk_caches[path]["entries"]
+
+        stat = os.stat(path)
+        try:
+            with open(_disk_cache_path(path), "rb") as f:
+                cache = marshal.load(f)
+            if (cache["version"], cache["htmldoom"]) != (
+                DISK_CACHE_VERSION,
+                htmldoom.__version__,
+            ):
+                raise ValueError(cache["version"], cache["htmldoom"])
+        except (OSError, EOFError, ValueError, TypeError, KeyError):
+            cache = None
+
+        if cache is None or (cache["mtime"], cache["size"]) != (
+            stat.st_mtime_ns,
+            stat.st_size,
+        ):
+            digest = _file_hash(path)
+            if cache is None or cache["hash"] != digest:
+                cache = dict(
+                    version=DISK_CACHE_VERSION,
+                    htmldoom=htmldoom.__version__,
+                    hash=digest,
+                    entries={},
+                )
+            cache.update(mtime=stat.st_mtime_ns, size=stat.st_size)
+            _unsaved.add(path)
 
-    if isinstance(directive, str):
-        directive = directive.split(".")
+        _disk_caches[path] = cache
+        return cache["entries"]
 
-    if directive:
-        for node in directive:
-            elements = elements[node]
 
-    if elements is None:
-        raise ValueError(
-            f"Invalid format here: {path} Valid format is:\n{VALID_FORMAT}"
-        )
+def save_disk_caches():
+    """Write the disk caches of the YAML files that have new components.
 
-    data = parse(elements)
-    if static:
-        data = data.decode().replace("{", "{{").replace("}", "}}").encode()
-    return data
+    It's called at exit. The processes that exit without running the `atexit`
+    functions (e.g. the `multiprocessing` workers) can call it themselves.
+    """
+    with _disk_caches_lock:
+        paths = list(_unsaved)
+        _unsaved.clear()
+        caches = [(path, _disk_caches.get(path)) for path in paths]
+    for path, cache in caches:
+        if cache is not None:
+            _save_disk_cache(path, cache["entries"])
+
+
+atexit.register(save_disk_caches)
+
+
+def _save_disk_cache(path, entries):
+    """Write the cached components of a YAML file, ignoring I/O errors."""
+    path = os.path.abspath(path)
+    cache_path = _disk_cache_path(path)
+    with _disk_caches_lock:
+        cache = _disk_caches.get(path)
+        if cache is None or cache["entries"] is not entries:
+            return  # Invalidated since, the entries are outdated.
+        data = marshal.dumps(dict(cache, entries=entries))
+    try:
+        os.makedirs(os.path.dirname(cache_path), exist_ok=True)
+        tmp_path = f"{cache_path}.{os.getpid()}.tmp"
+        with open(tmp_path, "wb") as f:
+            f.write(data)
+        os.replace(tmp_path, cache_path)
+    except OSError:
+        pass
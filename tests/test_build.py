@@ -0,0 +1,78 @@
+import os
+
+from htmldoom import elements as e
+from htmldoom import render
+from htmldoom.build import MANIFEST, build
+
+
+def render_page(name):
+    with open(os.path.join(os.environ["PAGES_DIR"], name, "title.txt")) as f:
+        return render(e.h1()(f.read()))
+
+
+def init_process(path):
+    with open(path, "a") as f:
+        f.write(f"{os.getpid()}\n")
+
+
+def make_site(tmp_path, monkeypatch):
+    monkeypatch.setenv("PAGES_DIR", str(tmp_path / "pages"))
+    for name in ("a", "b", "c"):
+        os.makedirs(tmp_path / "pages" / name)
+        (tmp_path / "pages" / name / "title.txt").write_text(f"<{name}>")
+    (tmp_path / "layout.yml").write_text("p: [[ x ]]")
+    return {
+        name: [str(tmp_path / "pages" / name)]
+        for name in os.listdir(tmp_path / "pages")
+    }
+
+
+def test_build(tmp_path, monkeypatch):
+    pages = make_site(tmp_path, monkeypatch)
+    out_dir = str(tmp_path / "dist")
+    deps = [str(tmp_path / "layout.yml")]
+
+    assert sorted(build(pages, render_page, out_dir, deps=deps)) == ["a", "b", "c"]
+    assert (tmp_path / "dist" / "a.html").read_bytes() == b"<h1>&lt;a&gt;</h1>"
+    assert (tmp_path / "dist" / MANIFEST).exists()
+
+    # Nothing changed.
+    assert build(pages, render_page, out_dir, deps=deps) == []
+
+    # A page input changed.
+    (tmp_path / "pages" / "b" / "title.txt").write_text("B")
+    assert build(pages, render_page, out_dir, deps=deps) == ["b"]
+    assert (tmp_path / "dist" / "b.html").read_bytes() == b"<h1>B</h1>"
+
+    # An output is missing.
+    os.remove(tmp_path / "dist" / "c.html")
+    assert build(pages, render_page, out_dir, deps=deps) == ["c"]
+
+    # A shared dependency changed.
+    (tmp_path / "layout.yml").write_text("p: [[ y ]]")
+    assert sorted(build(pages, render_page, out_dir, deps=deps)) == ["a", "b", "c"]
+
+    assert build(pages, render_page, out_dir, deps=deps, force=True) != []
+
+
+def test_build_workers(tmp_path, monkeypatch):
+    pages = make_site(tmp_path, monkeypatch)
+    out_dir = str(tmp_path / "dist")
+
+    pids_path = str(tmp_path / "pids.txt")
+    built = build(
+        pages,
+        render_page,
+        out_dir,
+        workers=2,
+        initializer=init_process,
+        initargs=(pids_path,),
+    )
+    assert sorted(built) == ["a", "b", "c"]
+    with open(pids_path) as f:
+        pids = f.read().split()
+    assert pids and len(pids) == len(set(pids))  # once per process
+    for name in built:
+        assert (tmp_path / "dist" / f"{name}.html").read_bytes() == (
+            f"<h1>&lt;{name}&gt;</h1>".encode()
+        )
@@ -0,0 +1,460 @@
+import gc
+import multiprocessing
+import socketserver
+import sys
+import threading
+import time
+from decimal import Decimal
+
+import pytest
+
+from htmldoom import CacheConfig
+from htmldoom.conf import CacheBackend
+from htmldoom import elements as e
+from htmldoom.cache import (
+    DictCache,
+    FrequencySketch,
+    LRUCache,
+    MemcachedCache,
+    SharedMemoryCache,
+    SizedLRUCache,
+    _shared_key,
+    cache_info,
+    clear_all,
+    dynamic,
+    is_dynamic,
+    load_snapshot,
+    memoize,
+    prometheus_metrics,
+    reset_stats,
+    save_snapshot,
+    uncached,
+)
+
+
+def test_lru_cache():
+    cache = LRUCache(2)
+    cache.set("a", 1)
+    cache.set("b", 2)
+    assert cache.get("a") == 1
+    cache.set("c", 3)
+    assert cache.get("b") is None
+    assert cache.get("a") == 1
+    assert cache.get("c") == 3
+    assert len(cache) == 2
+
+
+def test_sized_lru_cache():
+    cache = SizedLRUCache(10)
+    cache.set("a", b"xxxx")
+    cache.set("b", b"xxxx")
+    assert cache.currbytes == 10
+    assert cache.get("a") == b"xxxx"
+    cache.set("c", b"xxxx")
+    assert cache.get("b") is None
+    assert cache.get("a") == b"xxxx"
+    assert cache.currbytes == 10
+
+    cache.set("d", b"x" * 10)
+    assert cache.get("d") is None
+    assert len(cache) == 2
+
+    cache.clear()
+    assert cache.currbytes == 0
+
+
+def test_shared_memory_cache(tmp_path):
+    def key(i):
+        return bytes([i]) * 16
+
+    path = str(tmp_path / "shm")
+    cache = SharedMemoryCache(path, size=64, slots=4)
+    cache.set(key(1), b"a" * 30)
+    cache.set(key(2), "\u00e9")
+    assert cache.get(key(1)) == b"a" * 30
+    assert cache.get(key(2)) == "\u00e9"
+    assert cache.get(key(3)) is None
+
+    other = SharedMemoryCache(path, size=64, slots=4)
+    assert other.get(key(1)) == b"a" * 30
+
+    child = multiprocessing.get_context("fork").Process(
+        target=cache.set, args=(key(4), b"from child")
+    )
+    child.start()
+    child.join()
+    assert other.get(key(4)) == b"from child"
+
+    # Full, start over
+    cache.set(key(5), b"b" * 40)
+    assert cache.get(key(1)) is None
+    assert other.get(key(5)) == b"b" * 40
+
+    cache.close()
+    other.close()
+
+
+def test_shared_memory_cache_ttl(tmp_path, monkeypatch):
+    cache = SharedMemoryCache(str(tmp_path / "shm"), size=1024, prefix="app:")
+    cache.set(b"k", b"v", ttl=10)
+    cache.set(b"forever", b"v")
+    assert cache.get(b"k") == b"v"
+    assert SharedMemoryCache(str(tmp_path / "shm"), size=1024).get(b"k") is None
+
+    now = time.time()
+    monkeypatch.setattr("htmldoom.cache.time", lambda: now + 20)
+    assert cache.get(b"k") is None
+    assert cache.get(b"forever") == b"v"
+    cache.close()
+
+
+def test_dict_cache(monkeypatch):
+    cache = DictCache(prefix="app:", maxsize=2)
+    cache.set(b"a", b"1", ttl=10)
+    cache.set(b"b", "2")
+    assert cache.get(b"a") == b"1"
+    assert cache.get(b"b") == "2"
+    assert cache.get(b"c") is None
+    assert set(cache.data.data) == {b"app:a", b"app:b"}
+
+    now = time.time()
+    monkeypatch.setattr("htmldoom.cache.time", lambda: now + 20)
+    assert cache.get(b"a") is None
+    assert cache.get(b"b") == "2"
+
+
+class FakeMemcached(socketserver.ThreadingTCPServer):
+    """Just enough of the memcached text protocol for `MemcachedCache`."""
+
+    daemon_threads = True
+    allow_reuse_address = True
+
+    def __init__(self):
+        super().__init__(("127.0.0.1", 0), FakeMemcachedHandler)
+        self.data = {}
+
+
+class FakeMemcachedHandler(socketserver.StreamRequestHandler):
+    def handle(self):
+        data = self.server.data
+        for line in self.rfile:
+            cmd, key, *args = line.split()
+            if cmd == b"get":
+                if key in data:
+                    flags, exptime, value = data[key]
+                    self.wfile.write(
+                        b"VALUE %s %s %d\r\n%s\r\n" % (key, flags, len(value), value)
+                    )
+                self.wfile.write(b"END\r\n")
+            elif cmd == b"set":
+                flags, exptime, length = args
+                value = self.rfile.read(int(length) + 2)[:-2]
+                data[key] = (flags, int(exptime), value)
+                self.wfile.write(b"STORED\r\n")
+
+
+@pytest.fixture
+def memcached():
+    server = FakeMemcached()
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    yield server
+    server.shutdown()
+    server.server_close()
+
+
+def test_memcached_cache(memcached):
+    cache = MemcachedCache(memcached.server_address, prefix="app:")
+    assert cache.get(b"\x00k") is None
+    cache.set(b"\x00k", b"v\r\nEND\r\n", ttl=60)
+    cache.set(b"s", "\u00e9")
+    assert cache.get(b"\x00k") == b"v\r\nEND\r\n"
+    assert cache.get(b"s") == "\u00e9"
+    assert memcached.data[b"app:006b"][:2] == (b"0", 60)
+
+    cache.set(b"long", b"v", ttl=365 * 24 * 60 * 60)
+    assert memcached.data[b"app:6c6f6e67"][1] > time.time()
+
+    memcached.shutdown()
+    memcached.server_close()
+    unavailable = MemcachedCache(memcached.server_address)
+    assert unavailable.get(b"k") is None
+    unavailable.set(b"k", b"v")
+
+
+def test_memcached_cache_retry_after(monkeypatch):
+    connections = []
+
+    def create_connection(address, timeout):
+        connections.append(address)
+        raise ConnectionRefusedError(address)
+
+    monkeypatch.setattr("htmldoom.cache.socket.create_connection", create_connection)
+    cache = MemcachedCache(("127.0.0.1", 1), retry_after=1)
+    assert cache.get(b"k") is None
+    cache.set(b"k", b"v")
+    assert cache.get(b"k") is None
+    assert len(connections) == 1
+
+    now = time.time()
+    monkeypatch.setattr("htmldoom.cache.time", lambda: now + 1.5)
+    assert cache.get(b"k") is None
+    assert cache.get(b"k") is None
+    assert len(connections) == 2
+
+    # The delay doubles after each failure.
+    monkeypatch.setattr("htmldoom.cache.time", lambda: now + 3)
+    assert cache.get(b"k") is None
+    assert len(connections) == 2
+    monkeypatch.setattr("htmldoom.cache.time", lambda: now + 4)
+    assert cache.get(b"k") is None
+    assert len(connections) == 3
+
+
+def test_cache_backend():
+    class NoSet(CacheBackend):
+        def get(self, key):
+            return None
+
+    with pytest.raises(TypeError):
+        NoSet()
+
+
+def test_memoize_shared(tmp_path, monkeypatch):
+    shared = SharedMemoryCache(str(tmp_path / "shm"), size=4096)
+    monkeypatch.setattr(CacheConfig, "SHARED", shared)
+
+    calls = []
+
+    @memoize(name="test_memoize_shared")
+    def upper(text):
+        calls.append(text)
+        return text.upper()
+
+    assert upper("a") == "A"
+    upper.cache_clear()
+    assert upper("a") == "A"
+    assert calls == ["a"]
+
+    assert e.h4(class_="s")("x") == b'<h4 class="s">x</h4>'
+    clear_all()
+    assert e.h4(class_="t")("x") == b'<h4 class="t">x</h4>'
+    assert e.h4(class_="s")("x") == b'<h4 class="s">x</h4>'
+    shared.close()
+
+
+def test_memoize_lru():
+    calls = []
+
+    @memoize(name="test_memoize_lru")
+    def upper(text, suffix=""):
+        calls.append(text)
+        return text.upper() + suffix
+
+    assert upper("a") == "A"
+    assert upper("a") == "A"
+    assert upper("b", suffix="!") == "B!"
+    upper.cache_insert(("c",), {}, "inserted")
+    assert upper("c") == "inserted"
+    assert calls == ["a", "b"]
+    assert cache_info()[("test_memoize_lru", None)] == (2, 3, 3)
+    with pytest.raises(ValueError):
+        upper.cache_items()
+    with pytest.raises(ValueError):
+        save_snapshot("unused.bin")
+
+    upper.cache_evict(lambda args, kwargs: args == ("x",))
+    assert cache_info()[("test_memoize_lru", None)] == (2, 3, 0)
+
+
+def test_memoize_track_entries(monkeypatch):
+    @memoize(name="test_memoize_track_entries")
+    def upper(text, suffix=""):
+        return text.upper() + suffix
+
+    monkeypatch.setattr(CacheConfig, "TRACK_ENTRIES", True)
+    upper("a")
+    upper("b", suffix="!")
+    upper.cache_insert(("c",), {}, "inserted")
+    assert sorted(upper.cache_items()) == [
+        (("a",), {}, "A"),
+        (("b",), {"suffix": "!"}, "B!"),
+        (("c",), {}, "inserted"),
+    ]
+
+    upper.cache_evict(lambda args, kwargs: args == ("x",))
+    assert len(upper.cache_items()) == 3
+    upper.cache_evict(lambda args, kwargs: args == ("a",))
+    assert len(upper.cache_items()) == 2
+
+
+def test_shared_key():
+    interned, built = sys.intern("hello"), "".join(["hel", "lo"])
+    assert interned == built and interned is not built
+    key = _shared_key(("f", None), b"<p>", (interned, interned), {"a": 1, "b": 2})
+    assert key == _shared_key(("f", None), b"<p>", (built, "hello"), {"b": 2, "a": 1})
+    assert len(key) == 16
+    assert _shared_key(("f", None), None, (object(),), {}) is None
+
+
+def test_memoize_maxbytes(monkeypatch):
+    calls = []
+
+    @memoize
+    def upper(text):
+        calls.append(text)
+        return text.upper().encode()
+
+    assert upper("abc") == b"ABC"
+    assert upper("abc") == b"ABC"
+    assert calls == ["abc"]
+
+    # Each entry holds ~1000 bytes of key and value.
+    monkeypatch.setattr(CacheConfig, "MAXBYTES", 2500)
+    upper.cache_clear()
+    upper("x" * 500)
+    upper("y" * 500)
+    assert upper("x" * 500) == b"X" * 500
+    assert len(calls) == 3
+
+    upper("z" * 500)
+    upper("y" * 500)
+    assert len(calls) == 5
+    upper.cache_clear()
+
+
+def test_cache_info():
+    clear_all()
+    reset_stats()
+    e.h6(class_="x")("a")
+    e.h6(class_="x")("a")
+    e.h6(class_="x")("b")
+
+    assert cache_info()[("set_props", "h6")] == (2, 1, 1)
+    assert cache_info()[("set_children", "h6")] == (1, 2, 2)
+    assert cache_info()[("set_children", "h6")].hitrate == 1 / 3
+
+    metrics = prometheus_metrics()
+    assert 'htmldoom_cache_hits_total{function="set_props",tag="h6"} 2' in metrics
+    assert 'htmldoom_cache_entries{function="set_children",tag="h6"} 2' in metrics
+    assert 'htmldoom_cache_misses_total{function="render",tag=""}' in metrics
+
+    clear_all()
+    assert cache_info()[("set_props", "h6")] == (2, 1, 0)
+    reset_stats()
+    assert cache_info()[("set_props", "h6")] == (0, 0, 0)
+
+
+def test_snapshot(tmp_path, monkeypatch):
+    monkeypatch.setattr(CacheConfig, "TRACK_ENTRIES", True)
+
+    @memoize(name="snapshot_later")
+    def double(text):
+        return text * 2
+
+    clear_all()
+    e.h5(class_="x")("a")
+    e.hr(class_="x")
+    double("a")
+    double(Decimal(1))  # not serializable, skipped
+
+    path = tmp_path / "cache.bin"
+    save_snapshot(path)
+    del double
+    gc.collect()
+    clear_all()
+
+    assert load_snapshot(path) >= 2
+    reset_stats()
+    assert e.h5(class_="x")("a") == b'<h5 class="x">a</h5>'
+    assert e.hr(class_="x") == b'<hr class="x" />'
+    assert cache_info()[("set_props", "h5")][:2] == (1, 0)
+    assert cache_info()[("set_children", "h5")][:2] == (1, 0)
+    assert cache_info()[("set_props", "hr")][:2] == (1, 0)
+
+    # Defined after loading the snapshot
+    @memoize(name="snapshot_later")
+    def double(text):
+        return "not cached"
+
+    assert double("a") == "aa"
+
+
+def test_snapshot_admit_after(tmp_path, monkeypatch):
+    monkeypatch.setattr(CacheConfig, "TRACK_ENTRIES", True)
+    clear_all()
+    e.h5(class_="y")("a")
+    path = tmp_path / "cache.bin"
+    save_snapshot(path)
+
+    monkeypatch.setattr(CacheConfig, "ADMIT_AFTER", 2)
+    assert load_snapshot(path) >= 2
+    reset_stats()
+    assert e.h5(class_="y")("a") == b'<h5 class="y">a</h5>'
+    assert cache_info()[("set_props", "h5")][:2] == (1, 0)
+    assert cache_info()[("set_children", "h5")][:2] == (1, 0)
+
+
+def test_frequency_sketch():
+    sketch = FrequencySketch(width=64)
+    assert sketch.estimate(1) == 0
+    assert sketch.increment(1) == 1
+    assert sketch.increment(1) == 2
+    assert sketch.increment(1) == 3
+    assert sketch.estimate(1) == 3
+
+    # Aging halves the counters.
+    sketch.additions = sketch.sample_size - 1
+    sketch.increment(2)
+    assert sketch.estimate(1) == 1
+    assert sketch.additions == sketch.sample_size // 2
+
+
+def test_memoize_admit_after(monkeypatch):
+    calls = []
+
+    @memoize
+    def upper(text):
+        calls.append(text)
+        return text.upper()
+
+    monkeypatch.setattr(CacheConfig, "ADMIT_AFTER", 2)
+    upper("once")
+    upper("twice")
+    upper("twice")
+    upper("twice")
+    upper("twice")
+    assert calls == ["once", "twice", "twice"]
+    upper.cache_clear()
+
+
+def test_memoize_admit_after_maxsize(monkeypatch):
+    @memoize(name="test_memoize_admit_after_maxsize")
+    def upper(text):
+        return text.upper()
+
+    monkeypatch.setattr(CacheConfig, "MAXSIZE", 10)
+    monkeypatch.setattr(CacheConfig, "ADMIT_AFTER", 2)
+    for i in range(1000):
+        upper(str(i))
+        upper(str(i))
+    assert cache_info()[("test_memoize_admit_after_maxsize", None)].currsize == 10
+
+
+def test_dynamic():
+    clear_all()
+    reset_stats()
+    with dynamic():
+        assert is_dynamic()
+        assert e.h5(class_="x")("a") == b'<h5 class="x">a</h5>'
+        assert e.h5(class_="x")("a") == b'<h5 class="x">a</h5>'
+    assert not is_dynamic()
+
+    # Only the attributes are cached.
+    assert cache_info()[("set_props", "h5")][:2] == (1, 1)
+    assert cache_info()[("set_children", "h5")] == (0, 0, 0)
+    assert cache_info()[("txt", None)][:2] == (0, 0)
+
+    # Unless the tag is uncached too.
+    with dynamic():
+        assert uncached(e.h5)(id="u1")("a") == b'<h5 id="u1">a</h5>'
+    assert cache_info()[("set_props", "h5")] == (1, 1, 1)
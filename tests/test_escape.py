@@ -0,0 +1,23 @@
+from html import escape as html_escape
+
+from htmldoom.escape import escape, escape_bytes, escape_many
+
+TEXTS = ["", "plain text", "<p class='x'>Tom & \"Jerry\"</p>", "&amp;", "ünïcödé <>"]
+
+
+def test_escape():
+    for text in TEXTS:
+        assert escape(text) == html_escape(text)
+    text = "plain text"
+    assert escape(text) is text
+
+
+def test_escape_bytes():
+    for text in TEXTS:
+        assert escape_bytes(text.encode()) == html_escape(text).encode()
+
+
+def test_escape_many():
+    assert escape_many(TEXTS) == [html_escape(t).encode() for t in TEXTS]
+    assert escape_many(["a\0b", "<"]) == [b"a\0b", b"&lt;"]
+    assert escape_many([]) == []
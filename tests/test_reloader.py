@@ -0,0 +1,120 @@
+import os
+import time
+
+import pytest
+
+from htmldoom import reloader, yaml_loader
+from htmldoom.value_loader import loadvalues
+from htmldoom.yaml_loader import loadyaml as ly
+
+
+@pytest.fixture
+def watcher():
+    watcher = reloader.enable(interval=0.01, inotify=False)
+    yield watcher
+    reloader.disable()
+
+
+def write(path, content):
+    with open(path, "w") as f:
+        f.write(content)
+    stat = os.stat(path)
+    os.utime(path, ns=(stat.st_atime_ns, stat.st_mtime_ns + 10**9))
+
+
+def test_reload_yaml(tmp_path, watcher):
+    path, other = str(tmp_path / "a.yml"), str(tmp_path / "b.yml")
+    write(path, "p: [[ a ]]")
+    write(other, "p: [[ b ]]")
+    assert ly(path) == b"<p>a</p>"
+    assert ly(other) == b"<p>b</p>"
+    other_library = yaml_loader._libraries[other]
+
+    write(path, "p: [[ changed ]]")
+    watcher.check()
+    assert ly(path) == b"<p>changed</p>"
+    assert ly(other) == b"<p>b</p>"
+    assert yaml_loader._libraries[other] is other_library
+
+
+def test_reload_loaded_before(tmp_path):
+    path = str(tmp_path / "a.yml")
+    write(path, "p: [[ a ]]")
+    assert ly(path) == b"<p>a</p>"
+
+    watcher = reloader.enable(interval=0.01, inotify=False)
+    try:
+        write(path, "p: [[ b ]]")
+        watcher.check()
+        assert ly(path) == b"<p>b</p>"
+
+        # Changed while the reload mode was off.
+        reloader.disable()
+        write(path, "p: [[ c ]]")
+        reloader.enable(interval=0.01, inotify=False)
+        assert ly(path) == b"<p>c</p>"
+
+        # Enabling it again keeps the watches.
+        watcher = reloader.enable(interval=0.01, inotify=False)
+        write(path, "p: [[ d ]]")
+        watcher.check()
+        assert ly(path) == b"<p>d</p>"
+    finally:
+        reloader.disable()
+
+
+def test_reload_values(tmp_path, watcher):
+    write(str(tmp_path / "a.txt"), "a")
+    write(str(tmp_path / "b.yml"), "p: [[ b ]]")
+    values = loadvalues(str(tmp_path))
+    assert (values.a, values.b) == ("a", "<p>b</p>")
+
+    write(str(tmp_path / "a.txt"), "<changed>")
+    write(str(tmp_path / "b.yml"), "p: [[ changed ]]")
+    watcher.check()
+    values = loadvalues(str(tmp_path))
+    assert (values.a, values.b) == ("&lt;changed&gt;", "<p>changed</p>")
+
+
+def test_reload_inotify(tmp_path):
+    try:
+        reloader.InotifyWatcher().stop()
+    except OSError:
+        pytest.skip("inotify is not available")
+
+    reloader.enable(interval=0.01)
+    try:
+        path = str(tmp_path / "a.yml")
+        write(path, "p: [[ a ]]")
+        assert ly(path) == b"<p>a</p>"
+
+        write(path, "p: [[ changed ]]")
+        for _ in range(200):
+            if ly(path) != b"<p>a</p>":
+                break
+            time.sleep(0.01)
+        assert ly(path) == b"<p>changed</p>"
+    finally:
+        reloader.disable()
+
+
+def test_reload_inotify_polled(tmp_path):
+    try:
+        watcher = reloader.InotifyWatcher(interval=0.01)
+    except OSError:
+        pytest.skip("inotify is not available")
+
+    watcher._add_watch = lambda fd, path, mask: -1  # e.g. ENOSPC
+    path, changed = str(tmp_path / "a.txt"), []
+    write(path, "a")
+    watcher.watch(path, lambda: changed.append(path))
+    watcher.start()
+    try:
+        write(path, "changed")
+        for _ in range(200):
+            if changed:
+                break
+            time.sleep(0.01)
+        assert changed == [path]
+    finally:
+        watcher.stop()
@@ -1,10 +1,29 @@
+import asyncio
+import os
+import threading
+from collections import namedtuple
 from html import escape
 
 import pytest
 
 from htmldoom import elements as e
+from htmldoom import reloader
 from htmldoom.base import raw, txt
-from htmldoom.util import loadraw, loadtxt, render, renders
+from htmldoom.cache import DictCache, cache_info
+from htmldoom.util import (
+    arender,
+    astream,
+    fmt_prop,
+    loadraw,
+    loadtxt,
+    profile,
+    prop_name,
+    render,
+    render_many,
+    renders,
+    slot,
+    stream,
+)
 
 
 def test_render():
@@ -17,6 +36,14 @@ def test_render():
         render(1)
 
 
+def test_fmt_prop():
+    assert prop_name("class_") == "class"
+    assert prop_name("http_equiv") == "http-equiv"
+    assert fmt_prop("data_x_", 'a"b') == 'data-x="a\\"b"'
+    assert fmt_prop("a b", None) == '"a b"'
+    assert render(e.meta(http_equiv="refresh")) == '<meta http-equiv="refresh" />'
+
+
 def test_renders():
     @renders(e.p()("{x}"), e.p()("{x} again"))
     def render_paras(data: dict) -> dict:
@@ -33,6 +60,207 @@ def test_renders():
     )
 
 
+def test_renders_compiled_fields():
+    Point = namedtuple("Point", "x y")
+
+    @renders(e.p()("{p.x}:{p.y}"), e.p()("{n:03d} {{n}} {s!r}"))
+    def render_fields(p, n, s):
+        return {"p": p, "n": n, "s": s}
+
+    assert render_fields(Point("<", 2), 7, "&") == (b"<p><:2</p><p>007 {n} '&amp;'</p>")
+
+
+def test_renders_slots():
+    @renders(
+        e.style()("p { color: red; }"),
+        e.p(class_="{x}", title=slot("x"))(slot("x")),
+        e.div()(slot("html", raw=True)),
+    )
+    def render_slots(x, html):
+        return {"x": x, "html": html}
+
+    assert render_slots("<&>", "<b>{x}</b>") == (
+        b"<style>p { color: red; }</style>"
+        b'<p class="{x}" title="&lt;&amp;&gt;">&lt;&amp;&gt;</p>'
+        b"<div><b>{x}</b></div>"
+    )
+    assert render_slots(raw("<b>"), 1) == (
+        b"<style>p { color: red; }</style>"
+        b'<p class="{x}" title="<b>"><b></p><div>1</div>'
+    )
+
+
+def test_renders_backend():
+    backend = DictCache(prefix="test:")
+    calls = []
+
+    @renders(e.nav()(slot("user")), backend=backend, ttl=60)
+    def render_nav(user):
+        calls.append(user)
+        return {"user": user}
+
+    assert render_nav("<a>") == b"<nav>&lt;a&gt;</nav>"
+    assert render_nav("<a>") == b"<nav>&lt;a&gt;</nav>"
+    assert render_nav("b") == b"<nav>b</nav>"
+    assert calls == ["<a>", "b"]
+    assert len(backend.data) == 2
+
+
+def test_render_many():
+    @renders(e.tr()(e.td()(slot("name")), e.td()(slot("price"))))
+    def render_row(product):
+        return {"name": product[0], "price": product[1]}
+
+    @renders(e.p()("{x}"))
+    def render_para(x):
+        return {"x": x}
+
+    rows = [("Tom & Jerry", 10), ("Pooh", raw("<b>5</b>")), ("<", "x")]
+    expected = b"".join(map(render_row, rows))
+    assert render_many(render_row, rows) == expected
+    assert b"".join(render_many(render_row, iter(rows), chunk_size=2)) == expected
+    assert render_many(render_para, ["<", "y"]) == b"<p>&lt;</p><p>y</p>"
+    assert render_many(render_para, []) == b""
+
+
+def test_profile():
+    @renders(e.li()("{x}"))
+    def render_item(x):
+        return {"x": x}
+
+    @renders(e.ul()(slot("items")))
+    def render_list(items):
+        return {"items": b"".join(map(render_item, items))}
+
+    render_list(["a"])
+    with profile() as prof:
+        e.p()("profiled")
+        render_list(["a", "b"])
+
+    assert render_list(["c"]) == b"<ul><li>c</li></ul>"
+    list_name, item_name = render_list.name, render_item.name
+    assert prof.renders[list_name][:1] == (1,)
+    assert prof.renders[list_name].bytes == len(b"<ul><li>a</li><li>b</li></ul>")
+    assert prof.renders[item_name][:1] == (2,)
+    assert prof.cache[("set_children", "p")][:2] == (0, 1)
+
+    lines = prof.collapsed().splitlines()
+    assert [line.rsplit(" ", 1)[0] for line in lines] == [
+        list_name,
+        f"{list_name};{item_name}",
+    ]
+    assert all(line.rsplit(" ", 1)[1].isdigit() for line in lines)
+
+
+def test_profile_threads():
+    @renders(e.li()("{x}"))
+    def render_item(x):
+        return {"x": x}
+
+    started, done = threading.Event(), threading.Event()
+    profiles = []
+
+    def other_thread():
+        with profile() as prof:
+            started.set()
+            done.wait()
+            render_item("other")
+        profiles.append(prof)
+
+    thread = threading.Thread(target=other_thread)
+    thread.start()
+    started.wait()
+    with profile() as prof:
+        render_item("a")
+        render_item("b")
+    done.set()
+    thread.join()
+    render_item("c")
+    assert prof.renders[render_item.name][:1] == (2,)
+    assert profiles[0].renders[render_item.name][:1] == (1,)
+
+
+def test_stream():
+    rows = (e.li()(str(x)) for x in range(3))
+    assert list(stream(e.ul()(), "&", rows, flush_size=0)) == [
+        b"<ul></ul>",
+        b"&amp;",
+        b"<li>0</li>",
+        b"<li>1</li>",
+        b"<li>2</li>",
+    ]
+    assert list(stream(e.p(), [e.p()("x")], flush_size=10)) == [b"<p></p><p>x</p>"]
+    assert list(stream()) == []
+    with pytest.raises(ValueError):
+        list(stream(1))
+
+
+def run(coro):
+    """Like `asyncio.run`, which is missing on Python 3.6."""
+    loop = asyncio.new_event_loop()
+    try:
+        return loop.run_until_complete(coro)
+    finally:
+        loop.close()
+
+
+def test_astream():
+    async def collect():
+        return [c async for c in astream(e.p(), (e.p() for _ in range(2)))]
+
+    assert run(collect()) == [b"<p></p><p></p><p></p>"]
+
+
+def test_arender():
+    order = []
+
+    async def widget(name, delay):
+        await asyncio.sleep(delay)
+        order.append(name)
+        return e.p()(name)
+
+    async def rows():
+        for i in range(2):
+            yield e.li()(str(i))
+
+    async def collect():
+        return [
+            c
+            async for c in arender(
+                e.h1()("<title>"),
+                e.div()(widget("slow", 0.02), widget("fast", 0.01)),
+                e.ul()(rows()),
+            )
+        ]
+
+    chunks = run(collect())
+    assert order == ["fast", "slow"]
+    assert chunks[0] == b"<h1>&lt;title&gt;</h1><div>"
+    assert b"".join(chunks) == (
+        b"<h1>&lt;title&gt;</h1><div><p>slow</p><p>fast</p></div>"
+        b"<ul><li>0</li><li>1</li></ul>"
+    )
+
+    coro = widget("x", 0)
+    with pytest.raises(ValueError):
+        render(e.div()(coro))
+    coro.close()
+
+
+def test_arender_uncached():
+    async def widget():
+        return e.p()("x")
+
+    async def collect():
+        return b"".join([c async for c in arender(e.section()(widget()))])
+
+    before = cache_info().get(("set_children", "section"), (0, 0, 0))[2]
+    for _ in range(100):
+        assert run(collect()) == b"<section><p>x</p></section>"
+    # Only the first one, which turns on the checks, might be cached.
+    assert cache_info()[("set_children", "section")].currsize <= before + 1
+
+
 def test_loadtxt_dynamic():
     @renders(loadtxt("tests/assets/html_components/component.html"))
     def render_component():
@@ -63,3 +291,48 @@ def test_loadraw_static():
         return {"foo": "bar"}
 
     assert render_component() == raw("<p>{foo}</p>")
+
+
+def test_loadraw_mmap(tmp_path):
+    path = str(tmp_path / "style.css")
+    with open(path, "w") as f:
+        f.write("\n  p { color: red; }\n\n")
+
+    view = loadraw(path, mmap=True)
+    assert isinstance(view, memoryview)
+    assert view == b"p { color: red; }"
+    assert loadraw(path, mmap=True) is view
+    assert e.style()(view) == b"<style>p { color: red; }</style>"
+    assert render(view) == "p { color: red; }"
+    assert b"".join(stream(e.p(), view)) == b"<p></p>p { color: red; }"
+
+    with pytest.raises(ValueError):
+        loadraw(path, static=True, mmap=True)
+
+    empty = str(tmp_path / "empty.css")
+    open(empty, "w").close()
+    assert loadraw(empty, mmap=True) == b""
+
+
+def test_loadraw_cached(tmp_path):
+    path = str(tmp_path / "a.html")
+    with open(path, "w") as f:
+        f.write("<p>a</p>")
+    assert loadraw(path) is loadraw(path)
+    assert loadtxt(path) is loadtxt(path)
+
+    reloader.enable(interval=0.01, inotify=False)
+    try:
+        loadraw.cache_clear()
+        loadtxt.cache_clear()
+        assert loadraw(path) == b"<p>a</p>"
+        assert loadtxt(path) == b"&lt;p&gt;a&lt;/p&gt;"
+
+        with open(path, "w") as f:
+            f.write("<p>changed</p>")
+        os.utime(path, ns=(0, 0))
+        reloader._watcher.check()
+        assert loadraw(path) == b"<p>changed</p>"
+        assert loadtxt(path) == b"&lt;p&gt;changed&lt;/p&gt;"
+    finally:
+        reloader.disable()
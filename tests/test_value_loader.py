@@ -1,6 +1,6 @@
 import pytest
 
-from htmldoom.value_loader import loadvalues
+from htmldoom.value_loader import EXTENSION_RENDERERS, loadvalues
 
 
 def test_loadvalues():
@@ -10,6 +10,49 @@ def test_loadvalues():
     assert values.c.d == '<p class="x">x</p>'
 
 
+def test_loadvalues_workers():
+    values = loadvalues("tests/assets/values/valid", workers=2)
+    assert values == loadvalues("tests/assets/values/valid")
+
+    # Unpicklable renderers fall back to threads.
+    renderers = {
+        ext: lambda path, r=r: r(path) for ext, r in EXTENSION_RENDERERS.items()
+    }
+    assert loadvalues("tests/assets/values/valid", renderers, workers=2) == values
+
+    with pytest.raises(NameError):
+        loadvalues("tests/assets/values/invalid/duplicate", workers=2)
+    with pytest.raises(ValueError):
+        loadvalues("tests/assets/values/valid", lazy=True, workers=2)
+
+
+def test_loadvalues_lazy():
+    loaded = []
+
+    def tracked(renderer):
+        def render(path):
+            loaded.append(path)
+            return renderer(path)
+
+        return render
+
+    renderers = {ext: tracked(r) for ext, r in EXTENSION_RENDERERS.items()}
+
+    values = loadvalues("tests/assets/values/valid", renderers, lazy=True)
+    assert loaded == []
+    assert set(values._fields) == {"a", "b", "c"}
+
+    assert values.a == "<p>a</p>"
+    assert values.a == "<p>a</p>"
+    assert loaded == ["tests/assets/values/valid/a.html"]
+    assert values.c.d == '<p class="x">x</p>'
+    assert values.b == "1&lt;3&gt;2"
+    assert len(loaded) == 3
+
+    with pytest.raises(AttributeError):
+        values.x
+
+
 def test_loadvalues_unsupported():
     with pytest.raises(TypeError):
         loadvalues("tests/assets/values/invalid/unsupported_type")
@@ -18,6 +61,8 @@ def test_loadvalues_unsupported():
 def test_loadvalues_no_ext():
     with pytest.raises(NameError):
         loadvalues("tests/assets/values/invalid/no_ext")
+    with pytest.raises(NameError):
+        loadvalues("tests/assets/values/invalid/no_ext", lazy=True)
 
 
 def test_loadvalues_duplicate():
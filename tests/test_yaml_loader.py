@@ -1,9 +1,15 @@
+import os
+import shutil
+
 import pytest
+import yaml
 
+import htmldoom
+from htmldoom import YamlConfig
 from htmldoom import elements as e
-from htmldoom import render
+from htmldoom import render, yaml_loader
 from htmldoom.base import composite_tag, leaf_tag, txt
-from htmldoom.yaml_loader import VALID_FORMAT
+from htmldoom.yaml_loader import VALID_FORMAT, YamlLibrary
 from htmldoom.yaml_loader import loadyaml as ly
 
 YAML_COMPONENTS = "tests/assets/yaml_components/valid.yml"
@@ -103,3 +109,96 @@ def test_invalid_format():
         with pytest.raises(ValueError) as e:
             ly(YAML_INVALID_COMPONENTS, str(i))
         assert VALID_FORMAT in str(e.value)
+
+
+def test_disk_cache(tmp_path, monkeypatch):
+    monkeypatch.setattr(YamlConfig, "DISK_CACHE", True)
+    path = str(tmp_path / "alert.yml")
+    shutil.copy("tests/assets/yaml_components/red_alert.yml", path)
+
+    expected = ly("tests/assets/yaml_components/red_alert.yml")
+    assert ly(path) == expected
+    assert ly(path, static=True) == expected.replace(b"{!}", b"{{!}}")
+    assert not os.path.exists(tmp_path / "__htmldoom_cache__")
+    yaml_loader.save_disk_caches()
+    assert os.path.exists(tmp_path / "__htmldoom_cache__" / "alert.yml.cache")
+
+    def no_parse(*args):
+        raise AssertionError("should be loaded from the disk cache")
+
+    # A new process loads the components from the disk cache.
+    yaml_loader._disk_caches.clear()
+    yaml_loader._libraries.clear()
+    ly.cache_clear()
+    with monkeypatch.context() as m:
+        m.setattr(yaml_loader, "load", no_parse)
+        assert ly(path) == expected
+        assert ly(path, static=True) == expected.replace(b"{!}", b"{{!}}")
+
+    # Touching the file without changing it keeps the cache valid.
+    os.utime(path, ns=(0, 0))
+    yaml_loader._disk_caches.clear()
+    yaml_loader._libraries.clear()
+    ly.cache_clear()
+    with monkeypatch.context() as m:
+        m.setattr(yaml_loader, "load", no_parse)
+        assert ly(path) == expected
+
+    # Changing the file invalidates it.
+    with open(path, "w") as f:
+        f.write("p: [[ changed ]]")
+    yaml_loader._disk_caches.clear()
+    yaml_loader._libraries.clear()
+    ly.cache_clear()
+    assert ly(path) == b"<p>changed</p>"
+
+    # The caches written by another htmldoom version are ignored.
+    yaml_loader.save_disk_caches()
+    yaml_loader._disk_caches.clear()
+    yaml_loader._libraries.clear()
+    ly.cache_clear()
+    monkeypatch.setattr(htmldoom, "__version__", "v0.0.0")
+    with monkeypatch.context() as m:
+        m.setattr(yaml_loader, "load", lambda *args, **kwargs: {"p": [["reparsed"]]})
+        assert ly(path) == b"<p>reparsed</p>"
+
+    # The entries loaded before an invalidation are not saved.
+    cache_path = tmp_path / "__htmldoom_cache__" / "alert.yml.cache"
+    os.remove(cache_path)
+    entries = yaml_loader._disk_cache(path)
+    yaml_loader._invalidate(os.path.abspath(path))
+    yaml_loader._save_disk_cache(path, entries)
+    yaml_loader.save_disk_caches()
+    assert not os.path.exists(cache_path)
+
+
+def test_yaml_library(monkeypatch):
+    loads = []
+    load = yaml_loader.load
+
+    def counting_load(*args, **kwargs):
+        loads.append(args)
+        return load(*args, **kwargs)
+
+    monkeypatch.setattr(yaml_loader, "load", counting_load)
+
+    lib = YamlLibrary(YAML_COMPONENTS)
+    assert loads == []
+    assert lib["somevalue.foo"] == txt("bar")
+    assert lib.load(("switch", "case", True)) == txt("true")
+    assert lib.load("leaf_tag.with_attrs", static=True) == leaf_tag("sometag")(
+        class_="row"
+    )
+    assert lib["somevalue.foo"] is lib["somevalue.foo"]
+    assert len(loads) == 1
+
+    with pytest.raises(ValueError):
+        YamlLibrary(YAML_INVALID_COMPONENTS)["12"]
+
+
+def test_loader():
+    assert yaml_loader.LIBYAML == yaml.__with_libyaml__
+    if yaml.__with_libyaml__:
+        assert yaml_loader.Loader is yaml.CSafeLoader
+    else:
+        assert yaml_loader.Loader is yaml.SafeLoader